@@ -1,7 +1,8 @@
-import states, lib
+import states, lib, handler
 
 import props, utils
 from items import Item
+from output import Output
 from errors import *
 
 class Actor(Item):
@@ -47,6 +48,11 @@ class Actor(Item):
 	ITEM_UNAVAILABLE = "itemUnavailable"
 	'''Shown when the parser recognizes noun, but it's unavailable to actor.'''
 	VERB_UNKNOWN = "verbUnknown"
+	UNKNOWN_WORD = "unknownWord"
+	'''Printed when the input has a word the game doesn't know, but it looks like
+	a misspelling of words that it does know.'''
+	CORRECTED = "corrected"
+	'''Printed when the parser has replaced a misspelled word, see Lib.correct.'''
 	
 	NOT_EDIBLE = 'notEdible'
 	
@@ -55,6 +61,8 @@ class Actor(Item):
 	
 	ZERO_LENGTH_SENTENCE = "zeroLengthSentence"
 	"""Printed when player's input is an emptry string."""
+	NO_OBJECTS = "noObjects"
+	"""Printed when "all" doesn't refer to anything."""
 	
 	responses = {
 		NOT_A_DIRECTION : "[sentence[1].name] is not a direction.",
@@ -62,6 +70,7 @@ class Actor(Item):
 		TOUCH : "You feel nothing unexpected.",
 		CANT_DO : "You can't [verbs[0].name] [self.definite].",
 		ZERO_LENGTH_SENTENCE : "I don't understand what you mean.",
+		NO_OBJECTS : "There's nothing suitable here.",
 		ITEM_UNAVAILABLE : "You can't see anything like that here.",
 		'verbKnown' : "I only understood that you want to [verbs[0].name] something.",
 		UNHANDLED : "I don't know what that means.",
@@ -80,12 +89,23 @@ class Actor(Item):
 		SCORE : "You've earned %i points so far.",
 		NOT_NEAR : '(first walking %s)',
 		VERB_UNKNOWN : "You can't [sentence.words[0].name] things.",
+		UNKNOWN_WORD : 'I don\'t know the word "%s". Did you mean %s?',
+		CORRECTED : '(assuming "%s" means "%s")',
 		NOT_EDIBLE : "[nouns[0].definite] [nouns[0].verbPlural and 'are' or 'is'] hardly edible.",
 	}
 
 	LOOK = "look"
 	'''Verb used to get a description of the player's surroundings.'''
 	
+	sentences = (
+		('inventory', 'inv'),
+	)
+	
+	accessCache = None
+	'''[handler.worldVersion, canAccess results by item id, scope words] - What the
+	actor can reach, valid until the world changes. Kept out of the undo log and
+	save files.'''
+	
 	def __init__(self):
 		Item.__init__(self)
 		self.pronouns = {}
@@ -95,29 +115,51 @@ class Actor(Item):
 		
 		self.output = None
 		'''Output object last associated with this actor.'''
+		self.handled = False
+		'''True if the last sentence given to input was handled.'''
 
 	def input(self, sentence, output):
 		self.output = output
 		self.lastInput = sentence
+		self.handled = False
 		output.actor = self
 		output.sentence = sentence
 		sentence.actor = self
 
-		'''TODO:	Implement a recursive function to account for multiple
-					ambiguous words in one sentence.'''
-		try:
-			self.ownerGame.lib.parse(sentence)
-		except AmbiguityError, e:
-			state = states.Disambiguation(self, e)
-			self.state = state
-
-			if state.tryResolve():
-				output.write("(%s)" % state.words[0].wordObject.definite, False)
-				state.resumeMatching(state.words[0])
-				sentence = state.sentence
-			else:
-				output.write(self.state.message(), False)
+		game = self.ownerGame
+		state = self.state
+		if not isinstance(state, states.Disambiguation) or not state.choose(sentence):
+			if isinstance(state, states.Disambiguation):
+				state.restoreState()
+			
+			scope = None
+			if game.scopedParsing:
+				scope = self.scope()
+			reach = None
+			if game.lib.correct:
+				reach = self.scope()
+			try:
+				game.lib.parse(sentence, scope, reach)
+				state = None
+			except AmbiguityError, e:
+				state = states.Disambiguation(self, e)
+				self.state = state
+				state.tryResolve()
+			for token, replacement in sentence.corrections:
+				output.write(self.responses[self.CORRECTED] % (token, replacement), False)
+		
+		if state != None:
+			for match in state.chosen:
+				output.write("(%s)" % match.wordObject.definite, False)
+			if not state.done:
+				output.write(state.message(), False)
 				return output
+			
+			sentence = state.sentence
+			output.sentence = sentence
+		
+		if game.grammar != None:
+			sentence.tree = game.grammar.parse(sentence)
 
 		if len(sentence) == 0:
 			try:
@@ -129,7 +171,7 @@ class Actor(Item):
 
 		for word in sentence:
 			if issubclass(word.__class__, lib.Noun):
-				if word.item.pronoun != None:
+				if word.item.pronoun != None and self.pronouns.get(word.item.pronoun) is not word:
 					try:
 						if word.item.pronoun in self.pronouns:
 							self.pronouns[word.item.pronoun].removeWord(word.item.pronoun)
@@ -143,10 +185,175 @@ class Actor(Item):
 
 
 	
+	def __getstate__(self):
+		d = self.__dict__.copy()
+		d.pop('accessCache', None)
+		return d
+	
+	def reach(self):
+		'''Return accessCache, emptied first if the world has changed since it was
+		filled.'''
+		cache = self.accessCache
+		if cache is None or cache[0] != handler.worldVersion:
+			cache = [handler.worldVersion, {}, None]
+			self.__dict__['accessCache'] = cache
+		return cache
+	
+	def canAccess(self, other):
+		'''Item.canAccess with the results remembered in accessCache, so asking
+		about an item again before anything moves is a dictionary lookup.'''
+		results = self.reach()[1]
+		try:
+			return results[id(other)]
+		except KeyError:
+			pass
+		result = results[id(other)] = Item.canAccess(self, other)
+		return result
+	
+	def scope(self):
+		'''Collect the words of the items the actor can reach, walking the ownership
+		tree down from the outermost owner of the actor. The set is cached until the
+		world changes and must not be modified.
+		
+		@rtype	:	set'''
+		cache = self.reach()
+		if cache[2] is not None:
+			return cache[2]
+		
+		root = self
+		while root.owner != None:
+			root = root.owner
+		
+		words = set([self.word, root.word])
+		l = [root]
+		while l:
+			item = l.pop()
+			if item is not root and self.canAccess(item):
+				words.add(item.word)
+			l.extend(item.inventory.list)
+		cache[2] = words
+		return words
+	
+	def objects(self, sentence):
+		'''Find a list of objects following the verb of sentence, like "all", "all
+		but the key" or "the lamp, the hat and the box". "all" stands for the
+		movable items in the location of the actor, or the ones it carries if the
+		verb is "drop".
+		
+		@rtype	:	tuple
+		@return	:	(start, end, items), the list being sentence.words[start:end].
+					None if sentence doesn't have a list of objects.'''
+		words = sentence.words
+		start = 1
+		while start < len(words) and not isinstance(words[start], (lib.Noun, lib.Multiple)):
+			start += 1
+		if start >= len(words):
+			return None
+		
+		included = []
+		excluded = []
+		l = included
+		every = False
+		several = False
+		end = start
+		while end < len(words):
+			word = words[end]
+			if isinstance(word, lib.Noun):
+				l.append(word.item)
+			elif isinstance(word, lib.Multiple):
+				every = several = True
+			elif isinstance(word, lib.Conjunction):
+				several = True
+			elif isinstance(word, lib.Exclusion):
+				l = excluded
+			elif not isinstance(word, lib.Ignore):
+				break
+			end += 1
+		
+		if not several:
+			return None
+		
+		items = []
+		if every:
+			if sentence[0] == 'drop':
+				items = [item for item in self.inventory if props.Mobile in item.props]
+			elif not [prop for prop in self.owner.props if not prop.accessibleChildren()]:
+				for item in self.owner.inventory:
+					if props.Mobile in item.props and item is not self and self.canAccess(item):
+						items.append(item)
+		for item in included:
+			if item not in items:
+				items.append(item)
+		items = [item for item in items if item not in excluded]
+		return start, end, items
+	
+	def handleObjects(self, sentence, objects, output):
+		'''Handle sentence for each item of a list of objects in turn, see objects.
+		Each item is handled like a sentence naming it alone, with the responses
+		prefixed by the item name. Items taken or dropped with the plain response
+		are listed together in one line instead. Closes output.
+		
+		@type	sentence:	Sentence
+		@type	objects:	tuple
+		@type	output:		Output'''
+		start, end, items = objects
+		if not items:
+			self.write(output, self.NO_OBJECTS)
+		
+		dest = None
+		if end == len(sentence.words):
+			if sentence[0] == 'take':
+				dest = self
+				response = props.Mobile.TAKEN
+				several = props.Mobile.TAKEN_SEVERAL
+			elif sentence[0] == 'drop':
+				dest = self.owner
+				response = props.Mobile.DROPPED
+				several = props.Mobile.DROPPED_SEVERAL
+		if dest != None:
+			Item.logMoves(items, dest)
+		
+		done = []
+		for item in items:
+			owner = item.owner
+			s = sentence[:0]
+			s.words = sentence.words[:start] + (item.word,) + sentence.words[end:]
+			s.actor = self
+			o = Output()
+			o.actor = self
+			o.sentence = s
+			self.output = o
+			try:
+				self.state.handleWords(s, o)
+				self.unhandledSentence(s, o)
+			except OutputClosed:
+				pass
+			if dest != None and owner is not dest and item.owner is dest and o.lines and props.Mobile in item.props:
+				plain = o.eval(item.Mobile.responses[response], ('[', ']'), item)
+				if o.lines[-1] == o.cleanOutput(plain).strip():
+					o.lines.pop()
+					done.append(item)
+			output.lines.extend([o.cleanOutput('%s: %s' % (item.name, line)) for line in o.lines])
+		
+		if done:
+			l = [item.definite for item in done]
+			output.write(done[0].Mobile.responses[several] % utils.naturalJoin(l), False)
+		
+		self.output = output
+		output.open()
+		output.close()
+	
 	def unhandledSentence(self, sentence, output):
 		if len(sentence) == 0:
 			self.write(output, self.ZERO_LENGTH_SENTENCE)
 			
+		for word in sentence:
+			if isinstance(word, lib.Unknown):
+				l = self.ownerGame.lib.suggest(word.name, self.scope())
+				if l:
+					l = ['"%s"' % token for token in l]
+					output.write(self.responses[self.UNKNOWN_WORD] % (word.name, utils.naturalJoin(l, ', ', ' or ')))
+		
 		if sentence[0] == '*verb':
 
 			if len(sentence) == 1:
@@ -187,7 +394,7 @@ class Actor(Item):
 						elif sentence[0] == 'eat':
 							self.write(output, self.NOT_EDIBLE)
 
-						output.write(self.responses[self.CANT_DO])
+						output.write(self.responses[self.CANT_DO], obj=item)
 					else:
 						self.write(output, self.ITEM_UNAVAILABLE)
 				else:
@@ -195,10 +402,6 @@ class Actor(Item):
 		
 		self.write(output, 'unhandled')
 		
-	def handle(self, sentence, output):
-		if sentence == 'inventory':
-			self.inv(output)
-			
 	@property
 	def state(self):
 		return self._state
@@ -15,7 +15,8 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with PyF.  If not, see <http://www.gnu.org/licenses/>."""
 
-import lib, states, script, items, output, standardlib
+import re
+import lib, states, script, items, output, standardlib, handler, props, utils
 from handler import Handler, HandlerEvent
 from errors import *
 
@@ -24,8 +25,14 @@ class Game(Handler):
 	
 	lib = standardlib.standardLib()
 	'''Lib to use for parsing user input.'''
-	inventory = []
-	'''List of all items currently in the game.'''
+	inventory = None
+	'''List of all items currently in the game. Every game has its own, created
+	in __init__.'''
+	registry = None
+	'''Registry of the items in inventory, for finding them by name, class or
+	property.'''
+	lighting = None
+	'''props.Lighting - Which Dark items are lit, cached until the world changes.'''
 
 	name = "Untitled Game"
 	'''The title of the game.'''
@@ -38,6 +45,19 @@ class Game(Handler):
 	undoEnabled = True
 	'''True if player can use type "undo" to take back the last turn.'''
 	
+	scopedParsing = False
+	'''True if nouns the actor can't reach should only be recognized when no
+	reachable noun matches the same part of the input. Resolves most ambiguities
+	between items in different rooms before they reach the player.'''
+	
+	grammar = None
+	'''grammar.Grammar to structure parsed sentences with, eg.
+	grammar.standardGrammar(). When set, every handled sentence gets a ParseTree
+	in Sentence.tree, or None if no frame matches it.'''
+	
+	commandSeparator = re.compile(r'[.;!?]+|\bthen\b', re.I)
+	'''Splits a line of input into commands, see splitInput.'''
+	
 	savefile = 'default.save'
 	'''Default file to use for saving and loading game.'''
 	
@@ -51,6 +71,13 @@ class Game(Handler):
 	transcribe = False
 	'''True if the game should automatically enable transcription.'''
 	
+	SKIPPED = 'skipped'
+	'''Printed when the commands after one that wasn't handled are skipped.'''
+	
+	responses = {
+		SKIPPED : '(skipped %s)',
+	}
+	
 	EVT_PICKLE = 'gameSave'
 	'''Fired when user writes tries to save through the text interface.'''
 	EVT_UNPICKLE = 'gameLoad'
@@ -62,6 +89,9 @@ class Game(Handler):
 	def __init__(self):
 		'''Init game.'''
 		Handler.__init__(self)
+		self.inventory = []
+		self.registry = Registry(self.inventory)
+		self.lighting = props.Lighting(self)
 		self.turns = 0
 		'''Holds the number of turns that have passed. Ticks up every time 
 		Game.input is called.'''
@@ -135,20 +165,55 @@ class Game(Handler):
 		s = s.replace('*', '')
 		return s
 		
+	def splitInput(self, s):
+		'''Split a line of input into commands at periods, semicolons, question
+		and exclamation marks and the word "then".
+		
+		@type	s:	str
+		
+		@rtype	:	list of str'''
+		commands = [c.strip() for c in self.commandSeparator.split(s)]
+		commands = [c for c in commands if c]
+		if not commands:
+			commands = [s.strip()]
+		return commands
+	
+	def complete(self, s, limit=10):
+		'''Complete the last word of input s, offering only the nouns the actor can
+		reach. See Lib.complete.
+		
+		@type	s:	str
+		@type	limit:	int
+		
+		@rtype	:	list of str'''
+		return self.lib.complete(s, self.actor.scope(), limit)
+	
 	def getItem(self, name):
 		'''Get item with name. Raise KeyError if not in game.
 		
 		@type	name:	str
 		@rtype	:		Item'''
-		for item in self.inventory:
-			if item.name == name:
-				return item
+		items = self.registry.named(name)
+		if items:
+			return items[0]
 		raise KeyError("Game inventory has no item %s" % name)
 	
+	def query(self, name=None, cls=None, prop=None):
+		'''Return the items in game matching all of the given criteria, using the
+		registry instead of going through every item. See Registry.query.
+		
+		@rtype	:	list of Items'''
+		return self.registry.query(name, cls, prop)
+	
 	def input(self, s):
 		'''Handle user input and return output.
 		
 		@type	s:	str
+		@param	s:	One or more commands, see splitInput. They are handled in
+					order until one of them isn't handled or leaves the actor in a
+					state other than Running, such as a question. The rest are
+					skipped with a note. All of them write to the same output and are
+					taken back by a single undo.
 		
 		@rtype	:	Output'''
 		s = self.cleanInput(s)
@@ -159,26 +224,40 @@ class Game(Handler):
 			o.write('Debugger closed', False)
 			return o
 			
-		sentence = lib.Sentence(s)
+		commands = self.splitInput(s)
 
 		if self.undoEnabled:
-			if s == 'undo':
+			if commands == ['undo']:
 				try:
 					self.logger.rollBack()
+					self.registry.rebuild()
 					o.write('Done.', False)
 				except IndexError:
 					o.write("There's nothing to undo.", False)
 				return o
 			else:
 				self.logger.newFrame()
+		
+		request = self.actor.state.request
+		for i in range(len(commands)):
+			o.open()
+			sentence = lib.Sentence(commands[i])
+			self.actor.input(sentence, o)
 			
-		self.actor.input(sentence, o)
+			# Anything but the running state wants the next input for itself, and
+			# the rest of the line may depend on a command that failed.
+			if not isinstance(self.actor.state, states.Running) or not self.actor.handled:
+				skipped = ['"%s"' % command for command in commands[i+1:]]
+				if skipped:
+					o.open()
+					o.write(self.responses[self.SKIPPED] % utils.naturalJoin(skipped), False)
+				break
 		
 		if self.transcribe:
 			if not hasattr(self, 'transcription'):
 				import datetime
 				self.transcription = open("%s-%s.txt" % (self.name, datetime.datetime.now().strftime(r"%Y-%m-%d %H:%M")), 'w')
-			self.transcription.write(self.actor.state.request + ' ' + s.s + '\n')
+			self.transcription.write(request + ' ' + s + '\n')
 			self.transcription.write('\n'.join(o.lines) + '\n')
 
 		return o
@@ -228,6 +307,7 @@ class Game(Handler):
 		
 		item : Item subclass'''
 		self.inventory.append(item)
+		self.registry.add(item)
 		self.lib.append(item.word)
 		item.inventory.ownerGame = self
 		item.updateAccessInfo(self)
@@ -255,6 +335,7 @@ class Game(Handler):
 		
 		item.removeWord()
 		self.inventory.remove(item)
+		self.registry.remove(item)
 		item.game = None
 			
 	def initFromScript(self, dict):
@@ -293,12 +374,15 @@ class Game(Handler):
 		
 	def __setstate__(self, f):
 		self.inventory = f[0]
+		self.registry = Registry(self.inventory)
+		self.lighting = props.Lighting(self)
 		for item in self.inventory:
 			item.updateAccessInfo(self)
 		self.lib = f[1]
 		self.actor = f[2]
 		self.turns = f[3]
 		self.scoreList = f[4]
+		handler.worldChanged()
 		
 class GameEvent(HandlerEvent):
 	def __init__(self, type):
@@ -323,6 +407,127 @@ def createFromScript(file, context):
 			
 	return game
 	
+class Registry(object):
+	'''Indexes of the items in a game by name, class and property. Kept current by
+	Game.addItem, Game.removeItem, Item.addProp and Item.removeProp, and rebuilt
+	after undo.'''
+	
+	def __init__(self, items):
+		'''items : list of Items - The inventory of the game. Items already in it are
+			indexed.'''
+		self.items = items
+		self.ids = set()
+		'''Ids of the items registered.'''
+		self.names = {}
+		'''Lists of items by name. Items can be renamed after they're added, so
+		lookups check the current name and reindex on a miss.'''
+		self.classes = {}
+		'''Lists of items by class.'''
+		self.props = {}
+		'''Lists of items by the name of each of their properties.'''
+		self.rebuild()
+	
+	def rebuild(self):
+		'''Index the items again, eg. after undo has restored their properties.'''
+		self.ids = set()
+		self.names = {}
+		self.classes = {}
+		self.props = {}
+		for item in self.items:
+			self.add(item)
+	
+	def add(self, item):
+		'''Index item, which has just been added to the game.'''
+		self.ids.add(id(item))
+		self.names.setdefault(item.name, []).append(item)
+		self.classes.setdefault(item.__class__, []).append(item)
+		for prop in item.props:
+			self.addProp(item, prop)
+	
+	def remove(self, item):
+		'''Drop item from the indexes.'''
+		self.ids.discard(id(item))
+		_discard(self.names, item.name, item)
+		_discard(self.classes, item.__class__, item)
+		for prop in item.props:
+			self.removeProp(item, prop)
+	
+	def addProp(self, item, prop):
+		'''Index prop, which has just been added to item.'''
+		self.props.setdefault(prop.name, []).append(item)
+	
+	def removeProp(self, item, prop):
+		'''Drop prop, which has just been removed from item, from the indexes.'''
+		_discard(self.props, prop.name, item)
+	
+	def named(self, name):
+		'''Return the items called name, in the order they were added.
+		
+		@rtype	:	list of Items'''
+		l = [item for item in self.names.get(name, ()) if item.name == name]
+		if l:
+			return l
+		
+		self.names = {}
+		for item in self.items:
+			self.names.setdefault(item.name, []).append(item)
+		return list(self.names.get(name, ()))
+	
+	def ofClass(self, cls):
+		'''Return the items that are instances of cls or its subclasses, grouped by
+		class.
+		
+		@rtype	:	list of Items'''
+		l = []
+		for c in self.classes:
+			if issubclass(c, cls):
+				l.extend(self.classes[c])
+		return l
+	
+	def withProp(self, prop):
+		'''Return the items with property prop, in the order they were added.
+		
+		prop : Property subclass or str - The property or its name.
+		
+		@rtype	:	list of Items'''
+		if type(prop) not in (str, unicode):
+			prop = prop.name
+		return list(self.props.get(prop, ()))
+	
+	def query(self, name=None, cls=None, prop=None):
+		'''Return the items matching all of the given criteria. Starts from the
+		property or name index and only checks the items found there.
+		
+		name : str - Name of the item.
+		cls : Item subclass - Class of the item or one of its bases.
+		prop : Property subclass or str - Property of the item.
+		
+		@rtype	:	list of Items'''
+		if prop is not None:
+			l = self.withProp(prop)
+		elif name is not None:
+			l = self.named(name)
+		elif cls is not None:
+			return self.ofClass(cls)
+		else:
+			return list(self.items)
+		
+		if name is not None:
+			l = [item for item in l if item.name == name]
+		if cls is not None:
+			l = [item for item in l if isinstance(item, cls)]
+		return l
+
+def _discard(index, key, item):
+	'''Remove item from the list index[key], and the list if it's left empty.'''
+	l = index.get(key, ())
+	for i in range(len(l)):
+		if l[i] is item:
+			del l[i]
+			break
+	if key in index and not l:
+		del index[key]
+
 class Logger(object):
 	'''Class for logging changes in the game world.'''
 	
@@ -346,10 +551,13 @@ class Logger(object):
 			f = self.frame
 			if o not in f:
 				f[o] = {}
+			elif name in f[o]:
+				# Only the value from the start of the frame is restored.
+				return
 			
 			e = getattr(o, name, self.DELETE)
 			if type(e) == dict:
-				e = dict.copy()
+				e = e.copy()
 			elif type(e) == list:
 				e = e[:]
 			f[o][name] = e
@@ -363,3 +571,4 @@ class Logger(object):
 			for fo in item.__dict__.keys():
 				if item.__dict__[fo] == self.DELETE:
 					del item.__dict__[fo]
+		handler.worldChanged()
@@ -0,0 +1,197 @@
+'''Grammar of verb frames used to give parsed sentences a structure.'''
+
+"""This file is part of PyF.
+
+PyF is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyF is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyF.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import lib
+from errors import *
+
+verbBit = lib.WordMeta.bits['*verb']
+
+class Frame(object):
+	'''A verb frame such as "put *noun in *noun". Elements starting with * are
+	slots matching any word of that class, the rest are synonyms the word at
+	that position must have. The first slot is the direct object and the
+	second one the indirect object.'''
+	
+	def __init__(self, pattern, name):
+		'''pattern : str / tuple - Elements of the frame. Multi word synonyms like
+			"look at" need to be given in a tuple.
+		name : str - Name of the frame, eg. "insert".'''
+		if type(pattern) in (str, unicode):
+			pattern = tuple(pattern.split())
+		self.pattern = pattern
+		self.name = name
+		
+		self.elements = []
+		'''Compiled pattern, a (bit, id) pair for every element. Slots have a class
+		bit, synonyms have the interned id of the synonym.'''
+		for element in pattern:
+			if element[0] == '*':
+				if element not in lib.WordMeta.bits:
+					raise MatchingError("%s is not a word class" % element)
+				self.elements.append((lib.WordMeta.bits[element], None))
+			else:
+				self.elements.append((0, lib.wordId(element)))
+		
+		self.key = lib.wordId(pattern[0])
+		'''Id of the first element. Every word of a class has the class wildcard as
+		a synonym, so slots are keyed the same way.'''
+	
+	def match(self, words):
+		'''Match words against the frame.
+		
+		words : tuple of Words - Ignore words left out.
+		
+		returns : bool'''
+		if len(words) != len(self.elements):
+			return False
+		for i in range(len(words)):
+			bit, id = self.elements[i]
+			if bit:
+				if not words[i].classMask & bit or not words[i].words:
+					return False
+			elif id not in words[i].ids:
+				return False
+		return True
+	
+	def __str__(self):
+		return ' '.join(self.pattern)
+
+class ParseTree(object):
+	'''Structure of a sentence matched by a Frame.'''
+	
+	def __init__(self, frame, words):
+		self.frame = frame
+		'''The Frame the sentence matched.'''
+		self.name = frame.name
+		'''Name of the frame.'''
+		self.words = words
+		'''The words matched, Ignore words left out.'''
+		
+		self.verb = None
+		'''Verb - The verb of the sentence.'''
+		self.direct = None
+		'''Word - Direct object, eg. the coin in "put coin in box".'''
+		self.preposition = None
+		'''Word - Word between the objects, eg. "in" in "put coin in box".'''
+		self.indirect = None
+		'''Word - Indirect object, eg. the box in "put coin in box".'''
+		
+		slots = []
+		for i in range(len(words)):
+			word = words[i]
+			if self.verb == None and i == 0 and word.classMask & verbBit:
+				self.verb = word
+			elif frame.elements[i][0]:
+				slots.append(word)
+			elif len(slots) == 1 and self.preposition == None:
+				self.preposition = word
+		
+		if slots:
+			self.direct = slots[0]
+		if len(slots) > 1:
+			self.indirect = slots[1]
+	
+	def __str__(self):
+		l = [str(word) for word in (self.direct, self.preposition, self.indirect) if word != None]
+		return '%s(%s)' % (self.name, ', '.join(l))
+
+class Grammar(object):
+	'''A collection of frames compiled into a table keyed by the first element of
+	each frame, so a sentence is only compared against the frames starting with
+	one of the synonyms of its first word.'''
+	
+	def __init__(self, *frames):
+		'''*frames : (pattern, name) pairs or Frames, in order of precedence.'''
+		self.table = {}
+		'''Lists of (precedence, Frame) pairs by Frame.key.'''
+		self.count = 0
+		self.append(*frames)
+	
+	def append(self, *frames):
+		'''Add frames after the existing ones.'''
+		for frame in frames:
+			if not isinstance(frame, Frame):
+				frame = Frame(*frame)
+			self.table.setdefault(frame.key, []).append((self.count, frame))
+			self.count += 1
+	
+	def parse(self, sentence):
+		'''Find the first frame the sentence matches.
+		
+		sentence : Sentence - Finalized sentence.
+		
+		returns : ParseTree or None if no frame matches'''
+		words = sentence.words
+		content = sentence.index().content
+		if len(content) != len(words):
+			words = tuple([words[i] for i in content])
+		if not words:
+			return None
+		
+		l = []
+		for id in words[0].ids:
+			l.extend(self.table.get(id, ()))
+		l.sort()
+		
+		for i, frame in l:
+			if frame.match(words):
+				return ParseTree(frame, words)
+		return None
+
+frames = (
+	('go *direction', 'go'),
+	('*direction', 'go'),
+	('examine *noun', 'examine'),
+	(('look at', '*noun'), 'examine'),
+	('take *noun', 'take'),
+	(('pick up', '*noun'), 'take'),
+	(('take off', '*noun'), 'strip'),
+	(('put on', '*noun'), 'dress'),
+	('take *noun off', 'strip'),
+	('drop *noun', 'drop'),
+	('put *noun in *noun', 'insert'),
+	('put *noun on *noun', 'putOn'),
+	('put *noun on', 'dress'),
+	('give *noun to *noun', 'give'),
+	('show *noun to *noun', 'show'),
+	('throw *noun at *noun', 'throwAt'),
+	('ask *noun about *noun', 'ask'),
+	('tell *noun about *noun', 'tell'),
+	(('talk to', '*noun'), 'talk'),
+	('open *noun', 'open'),
+	('close *noun', 'close'),
+	('lock *noun with *noun', 'lock'),
+	('unlock *noun with *noun', 'unlock'),
+	(('turn on', '*noun'), 'turnOn'),
+	('turn *noun on', 'turnOn'),
+	(('turn off', '*noun'), 'turnOff'),
+	('turn *noun off', 'turnOff'),
+	('dress *noun', 'dress'),
+	('strip *noun', 'strip'),
+	('push *noun *direction', 'pushTo'),
+	('inventory', 'inventory'),
+	('*verb', 'intransitive'),
+	('*verb *noun', 'transitive'),
+	('*verb *noun *preposition *noun', 'ditransitive'),
+	('*verb *preposition *noun', 'prepositional'),
+)
+'''Frames for the verbs in standardlib, most specific first.'''
+
+def standardGrammar():
+	'''Return a new Grammar with the default frames.'''
+	return Grammar(*frames)
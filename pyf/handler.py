@@ -24,7 +24,8 @@ class HandlerMeta(type):
 	def __call__(cls, *args, **kwargs):
 		f = type.__call__(cls, *args, **kwargs)
 		f.handlers = HandlerAccess(f)
-		f.listeners = f.listeners.copy()
+		# Pin the instance to the listener table its class had at creation.
+		f.listeners = f.listeners
 		f.responses = responses.Responses(f, f.responses)
 		return f
 		
@@ -33,21 +34,45 @@ class HandlerMeta(type):
 		o.responses = o.responses.copy()
 		o.listeners = {}
 		o.inst = None
+		o.dispatchTable = dispatchTable(o)
 		return o
 
+def dispatchTable(cls):
+	'''Build an index of cls.sentences keyed by the first token of each pattern.
+	sentences is looked up like any class attribute, so a subclass declaring its
+	own replaces the patterns of its bases, and sentences = () switches them off.
+	
+	@rtype	:	dict'''
+	table = {}
+	i = 0
+	for pattern, name in cls.sentences:
+		if type(pattern) == tuple:
+			key = pattern[0]
+		else:
+			key = pattern
+		table.setdefault(key.lower().split()[0], []).append((i, pattern, name))
+		i += 1
+	return table
+
 class Handler(object):
 	'''Base class for any object that needs to handle sentences.'''
 	
 	__metaclass__ = HandlerMeta
 	responses = {}
-		
+	
+	sentences = ()
+	'''Tuple of (pattern, method name) pairs. When a sentence matches pattern the
+	method is called with output as the only argument. Only the first matching
+	pattern is handled, and only after handle() has run without closing the output,
+	so handle() can still override the patterns. Patterns are indexed by their verb
+	when the class is created, so sentences with other verbs are never compared
+	against them. A subclass declaring sentences replaces those of its bases; add
+	to them with eg. sentences = Base.sentences + (...).'''
+	
 	def __init__(self):
 		self.owner = getattr(self, 'owner', None)
 		'''Owner of this object in the game world.'''
 		
-		self.responses = self.responses.copy()
-		'''Instantiated into a Responses object after object initiation.'''
-		
 	def XMLSetup(self, node):
 		'''Add attr tags into the dictionary and event tags to listeners.
 		
@@ -106,21 +131,36 @@ class Handler(object):
 			raise GameError("Object %s hasn't been added to a game yet." % str(self))
 	
 	def dispatchEvent(self, event, output=None):
-		'''Dispatch an event in to the event flow.
+		'''Dispatch an event in to the event flow. The listeners are checked first;
+		the event is only created and its output only looked up if there are any.
 		
 		@type	event:	str / HandlerEvent
 		@param	event:	str - create new HandlerEvent with type event
 			HandlerEvent - passed to handlers as is
 			
 		@type 	output:	Output
-		@param	output:	Output instance to associate with this event.'''
+		@param	output:	Output instance to associate with this event.
+		
+		@rtype	:	HandlerEvent
+		@return	:	The event dispatched. None if event is a str and nothing listens
+					to it.'''
 		
 		if type(event) in (unicode, str):
 			id = event
-			event = HandlerEvent(event, output)
 		else:
 			id = event.type
-
+		
+		listeners = self.listeners.get(id)
+		countEvent(id, listeners)
+		if not listeners:
+			if type(event) in (unicode, str):
+				return None
+			event.target = self
+			event.done = True
+			return event
+		
+		if type(event) in (unicode, str):
+			event = HandlerEvent(event, output)
 		event.target = self
 		
 		if event.output is None:
@@ -129,24 +169,42 @@ class Handler(object):
 			except GameError:
 				pass
 		
-		try:
-			for f in self.listeners[id]:
-				if f.__class__ in (tuple, list):
-					f[-1](*f[:-1] + (event,))
-				else:
-					if event.output != None:
-						event.output.write(f)
-		except KeyError:
-			pass
+		for f in listeners:
+			if f.__class__ in (tuple, list):
+				f[-1](*f[:-1] + (event,))
+			else:
+				if event.output != None:
+					event.output.write(f)
 			
 		event.done = True
 		return event
+	
+	def dispatchNew(self, cls, type, *args):
+		'''Create an event and dispatch it, see dispatchEvent. The event is only
+		created if there are listeners for type, saving the work for events that
+		are usually not listened to, like the ones fired when items move.
+		
+		@type	cls:	class
+		@param	cls:	HandlerEvent subclass, created with (type, None) + args.
+		
+		@type	type:	str
+		
+		@rtype	:	HandlerEvent / None'''
+		if self.listeners.get(type):
+			return self.dispatchEvent(cls(type, None, *args))
+		countEvent(type, None)
+		return None
 			
 	@classmethod
 	def addClassEventListener(cls, type, function):
-		if type not in cls.listeners:
-			cls.listeners[type] = []
-		cls.listeners[type].insert(0, function)
+		'''Add event listener for instances created after this.
+		
+		The listener tables of classes and instances are never changed in place,
+		only replaced with a changed copy. Instances start out sharing the table of
+		their class and only get their own when a listener is added or removed.'''
+		listeners = cls.listeners.copy()
+		listeners[type] = [function] + listeners.get(type, [])
+		cls.listeners = listeners
 		
 	def addEventListener(self, type, handler):
 		'''Add event listener.
@@ -159,13 +217,10 @@ class Handler(object):
 							fired.
 							[-1] The actual handler function.'''
 		validateHandlerFunction(handler[1])
-			
-		if type not in self.listeners:
-			self.listeners[type] = []
-			
-		l = self.listeners[type]
-		log(self, 'listeners')
-		l.insert(0, handler)
+		
+		listeners = self.listeners.copy()
+		listeners[type] = [handler] + listeners.get(type, [])
+		self.listeners = listeners
 		
 	def removeEventListener(self, type, handler):
 		'''Remove event listener.
@@ -175,8 +230,10 @@ class Handler(object):
 		
 		@type	handler:	tuple
 		@param	handler:	The same tuple that was used to add the event listener.'''
-		log(self, 'listeners')
-		self.listeners[type].remove(handler)
+		listeners = self.listeners.copy()
+		listeners[type] = listeners[type][:]
+		listeners[type].remove(handler)
+		self.listeners = listeners
 	
 	def intHandle(self, sentence, output):
 		'''Default sentence handling process. Should be called from State.handle.'''
@@ -186,11 +243,57 @@ class Handler(object):
 		'''Run output through the default handling process. Shouldn't be called 
 		externally.'''
 		self.handle(sentence, output)
+		if not output.closed:
+			self.dispatch(sentence, output)
 		self.handlers.handle(sentence, output)
+	
+	def dispatch(self, sentence, output):
+		'''Call the method of the first pattern in sentences that sentence matches.
+		Only patterns starting with a synonym of the first word in sentence are
+		compared.'''
+		table = self.dispatchTable
+		if not table or len(sentence) == 0:
+			return
+		
+		l = []
+		for synonym in sentence[0]:
+			l.extend(table.get(synonym.split(' ', 1)[0], ()))
 		
+		l.sort()
+		for i, pattern, name in l:
+			if sentence == pattern:
+				getattr(self, name)(output)
+				return
+	
 	def handle(self, sentence, output):
 		pass
 		
+eventCounts = {}
+'''Event statistics by event type, a [dispatched, listened to] pair of counts
+for each. Useful for finding the events fired most often, and the ones fired
+in vain.'''
+
+def countEvent(type, listeners):
+	'''Count a dispatch of an event of type in eventCounts.'''
+	try:
+		counts = eventCounts[type]
+	except KeyError:
+		counts = eventCounts[type] = [0, 0]
+	counts[0] += 1
+	if listeners:
+		counts[1] += 1
+
+worldVersion = 0
+'''Number of changes made to the game world that can change what the actors are
+able to reach. Caches of reachability are tagged with it, see worldChanged.'''
+
+def worldChanged():
+	'''Invalidate every cache of what the actors can reach. Called whenever an
+	item moves or its access state changes. The version never goes back, not even
+	on undo, so a stale cache can't pass for a fresh one.'''
+	global worldVersion
+	worldVersion += 1
+
 def log(self, name):
 	try:
 		self.ownerGame.log(self, name)
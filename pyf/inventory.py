@@ -40,11 +40,13 @@ class Inventory:
 		'''Get inventory length.'''
 		return len(self.list)
 			
-	def remove(self, item):
-		'''Remove item from item list.'''
-		self.log()
+	def remove(self, item, log=True):
+		'''Remove item from item list. Pass log=False if the list has already been
+		logged for undo.'''
+		if log:
+			self.log()
 		self.list.remove(item)
-		
+	
 	def log(self):
 		try:
 			self.ownerGame.logger.log(self, 'list')
@@ -53,14 +55,15 @@ class Inventory:
 		except AttributeError:
 			pass
 		
-	def append(self, item):
+	def append(self, item, log=True):
 		'''Add item to inventory list. Raises InventoryError if item is already in 
-		list.'''
+		list. Pass log=False if the list has already been logged for undo.'''
 		if item in self.list:
 			raise InventoryError("Item %s already found in inventory." % str(item.name))
-		self.log()
+		if log:
+			self.log()
 		self.list.append(item)
-
+	
 	def __contains__(self, other):
 		'''Returns other in itemList.'''
 		return other in self.list
\ No newline at end of file
@@ -19,6 +19,7 @@ along with PyF.  If not, see <http://www.gnu.org/licenses/>.
 import utils, inventory, new, handler, props
 
 from handler import Handler, HandlerMeta
+from props import PropertyList
 from errors import *
 
 import lib, copy
@@ -41,7 +42,7 @@ class WordAccessor(PrivateAccessor):
 		return setattr(instance.word, self.name, value)
 		
 class ItemMeta(HandlerMeta):
-	wordAccessors = ('name','definite','indefinite')
+	wordAccessors = ('name','definite','indefinite','adjective')
 	def __init__(cls, *args, **kwargs):
 		HandlerMeta.__init__(cls, *args, **kwargs)
 		for name in ItemMeta.wordAccessors:
@@ -59,6 +60,15 @@ class ItemMeta(HandlerMeta):
 			
 		return self
 
+paths = [None, {}, {}]
+'''[handler.worldVersion, Item.ancestors by item id, Item.absLocation by item id] -
+Paths up the ownership and location trees, valid until the world changes.'''
+
+def cachedPaths():
+	'''Return paths, emptied first if the world has changed since it was filled.'''
+	if paths[0] != handler.worldVersion:
+		paths[:] = [handler.worldVersion, {}, {}]
+	return paths
 		
 class Item(Handler):
 	'''Item is the base class for all the items in PyF game world.'''
@@ -132,6 +142,10 @@ class Item(Handler):
 	
 	listeners = {}
 	
+	worldAttributes = ('owner', 'location', 'available', 'props', 'needTravel')
+	'''Attributes that change what the actors can reach. Setting one of them calls
+	handler.worldChanged.'''
+	
 	def __init__(self):
 		self.word = self.wordClass()
 		self.word.item = self
@@ -141,7 +155,7 @@ class Item(Handler):
 		cls.inst = self
 		self.game = None
 		
-		self.props = ()
+		self.props = PropertyList()
 		self.inventory = inventory.Inventory()
 		'''list - contains all the items this item owns'''
 		
@@ -176,6 +190,11 @@ class Item(Handler):
 		else:
 			return id(self) == id(other)
 			
+	def __setattr__(self, name, value):
+		Handler.__setattr__(self, name, value)
+		if name in self.worldAttributes:
+			handler.worldChanged()
+	
 	@property
 	def accessible(self):
 		'''Proxy for self.accessible'''
@@ -240,26 +259,51 @@ class Item(Handler):
 	
 	@property
 	def absLocation(self):
+		'''The nearest location up the location tree that needs travel, or the
+		outermost location. Cached until the world changes.'''
+		cache = cachedPaths()[2]
+		try:
+			return cache[id(self)]
+		except KeyError:
+			pass
+		
 		if self.location == None:
-			return self
+			location = self
 		elif self.location.needTravel:
-			return self.location
+			location = self.location
 		else:
-			return self.location.absLocation
-			
+			location = self.location.absLocation
+		cache[id(self)] = location
+		return location
+	
+	def ancestors(self):
+		'''Return the owners of self, nearest first, together with the set of their
+		ids. Built from the owner's own ancestors and cached until the world changes.
+		
+		@rtype	:	(tuple, frozenset)'''
+		cache = cachedPaths()[1]
+		try:
+			return cache[id(self)]
+		except KeyError:
+			pass
+		
+		owner = self.owner
+		if owner == None:
+			path = ((), frozenset())
+		else:
+			owners, ids = owner.ancestors()
+			path = ((owner,) + owners, ids.union((id(owner),)))
+		cache[id(self)] = path
+		return path
 		
 	def handleEvents(self, sentence):
 		self.dispatchEvent(self.EVT_HANDLE)
-		current = self
-		while current != None:
-			if current == sentence.actor:
+		if self is sentence.actor:
+			return
+		for current in self.ancestors()[0]:
+			if current is sentence.actor:
 				break
-			elif current == self:
-				current = current.owner
-				continue
-
 			current.dispatchEvent(current.EVT_OWNED_ITEM_HANDLE)
-			current = current.owner
 		
 	def intHandle(self, sentence, output):
 		self.word.addWord('*self')
@@ -286,10 +330,13 @@ class Item(Handler):
 		self.word.removeWord('*self')
 		
 	def __getattr__(self, name):
-		try:
-			return self.getProp(name)
-		except PropError:
-			raise AttributeError("%s instance has no attribute '%s'" % (self.__class__.__name__, name))
+		props = self.__dict__.get('props')
+		if props:
+			try:
+				return props.names[name]
+			except KeyError:
+				pass
+		raise AttributeError("%s instance has no attribute '%s'" % (self.__class__.__name__, name))
 		
 	def moveToActor(self, output):
 		'''Try to move the object to game.actor and write inline output accordingly.
@@ -307,18 +354,13 @@ class Item(Handler):
 		'''Get property from property list.
 		
 		name : str'''
-		for prop in self.props:
-			if prop.name == name:
-				return prop
-		
-		raise PropError("Item %s has no property %s." % (self, name))
+		try:
+			return self.props.names[name]
+		except KeyError:
+			raise PropError("Item %s has no property %s." % (self, name))
 		
 	def hasProp(self, name):
-		for prop in self.props:
-			if prop.__class__.__name__ == name:
-				return True
-		
-		return False
+		return name in self.props.classNames
 		
 	def addProp(self, property):
 		'''Add new property. finalizeProps should be called afterwards.
@@ -327,6 +369,8 @@ class Item(Handler):
 		self.props += (property,)
 		property.setParent(self)
 		self.newprops.append(property)
+		if self.game is not None:
+			self.game.registry.addProp(self, property)
 
 	def finalizeProps(self):
 		'''Finalize the current property list.'''
@@ -340,7 +384,9 @@ class Item(Handler):
 		prop : Property - Property in the current propertylist.'''
 		l = list(self.props)
 		l.remove(prop)
-		self.props = tuple(l)
+		self.props = PropertyList(l)
+		if self.game is not None:
+			self.game.registry.removeProp(self, prop)
 		
 	def move(self, dest):
 		'''Move self to Item dest. This function should always be called to move objects
@@ -348,37 +394,79 @@ class Item(Handler):
 		listener.
 		
 		dest : Item'''
-		try:
-			output = self.ownerGame.actor.output
-		except GameError:
-			output = None
-		self.dispatchEvent(ItemMoveEvent(self.EVT_MOVED, output, self.owner, dest, self))
+		self.doMove(dest)
+	
+	def doMove(self, dest, log=True):
+		'''Fire the events of move and move self to dest. A listener can stop the
+		move by closing the output.
+		
+		dest : Item
+		log : bool - False if the inventories involved have already been logged
+			for undo.'''
+		owner = self.owner
+		self.dispatchNew(ItemMoveEvent, self.EVT_MOVED, owner, dest, self)
 		if dest != None:
-			dest.dispatchEvent(ItemMoveEvent(self.EVT_ITEM_RECEIVED, output, self.owner, dest, self))
-
-		if self.owner != None:
-			self.owner.dispatchEvent(ItemMoveEvent(self.EVT_ITEM_LOST, output, self.owner, dest, self))
-			
+			dest.dispatchNew(ItemMoveEvent, dest.EVT_ITEM_RECEIVED, owner, dest, self)
+		if owner != None:
+			owner.dispatchNew(ItemMoveEvent, owner.EVT_ITEM_LOST, owner, dest, self)
+		
 		self.intMove(dest)
-			
+		
 		if self.owner != None:
-			self.owner.inventory.remove(self)
-
+			self.owner.inventory.remove(self, log)
+		
 		self.owner = dest
 		
-		if self.owner != None:
-			self.owner.inventory.append(self)
+		if dest != None:
+			dest.inventory.append(self, log)
+	
+	@classmethod
+	def moveItems(cls, items, dest, output=None):
+		'''Move several items to Item dest, each one as with move. The inventories
+		involved are logged for undo once, before any of them changes. A listener
+		closing the output stops the move of that item only, the rest are still
+		moved.
+		
+		items : list of Items
+		dest : Item
+		output : Output - Reopened after a move is stopped, so the listeners of
+			the remaining items can still write to it.
+		
+		returns : list of the Items moved'''
+		cls.logMoves(items, dest)
+		moved = []
+		for item in items:
+			try:
+				item.doMove(dest, False)
+			except OutputClosed:
+				if output != None:
+					output.open()
+				continue
+			moved.append(item)
+		return moved
 			
+	@classmethod
+	def logMoves(cls, items, dest):
+		'''Log the inventories of the owners of items and of dest for undo, once
+		each, before moving the items to dest.
+		
+		items : list of Items
+		dest : Item'''
+		inventories = {}
+		for item in items:
+			if item.owner != None:
+				inventories[id(item.owner)] = item.owner.inventory
+		if dest != None:
+			inventories[id(dest)] = dest.inventory
+		for inventory in inventories.values():
+			inventory.log()
+	
 	def intMove(self, dest):
-		try:
-			output = self.ownerGame.actor.output
-		except GameError:
-			output = None
-		self.dispatchEvent(ItemMoveEvent(self.EVT_INT_MOVED, output, self.location, dest, self))
+		self.dispatchNew(ItemMoveEvent, self.EVT_INT_MOVED, self.location, dest, self)
 		if self.location != None:
-			self.location.dispatchEvent(ItemMoveEvent(self.EVT_ITEM_INT_LOST, output, self.location, dest, self))
+			self.location.dispatchNew(ItemMoveEvent, self.EVT_ITEM_INT_LOST, self.location, dest, self)
 		if dest != None:
-			dest.dispatchEvent(ItemMoveEvent(self.EVT_ITEM_INT_RECEIVED, output, self.location, dest, self))
+			dest.dispatchNew(ItemMoveEvent, self.EVT_ITEM_INT_RECEIVED, self.location, dest, self)
 		
 		self.location = dest
 		
@@ -394,13 +482,15 @@ class Item(Handler):
 		
 	def isIn(self, other):
 		'''Returns true if self is inside other in the ownership tree. Ignores 
-		accessibility modifiers'''
-		if self.owner == None:
-			return False
-		elif self.owner == other:
+		accessibility modifiers. other may also be an Item class.'''
+		owners, ids = self.ancestors()
+		if id(other) in ids:
 			return True
-		else:
-			return self.owner.isIn(other)
+		elif isinstance(other, type):
+			for owner in owners:
+				if type(owner) is other:
+					return True
+		return False
 
 	def canAccess(self, other):
 		"""Called to check if other can self can access other in the game world. 
@@ -458,6 +548,7 @@ class Creature(Item):
 	
 def _addExit(self, dir, event):
 	self.exits[dir] = event.target
+	handler.worldChanged()
 	
 def _actorMove(self, receive, event):
 	if type(event.target) == Actor:
@@ -581,6 +672,8 @@ class Door(Room):
 				
 		return self.exit(d).access(d, output)
 		
+	worldAttributes = Item.worldAttributes + ('exits',)
+	
 	def availableTo(self, other):
 		for exit in self.exits:
 			if other.owner == self.exits[exit]:
@@ -17,6 +17,25 @@ along with PyF.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 from errors import *
+from collections import OrderedDict
+import re, bisect
+
+wordIds = {}
+'''Integer id of every synonym used by any Word, shared by all libs. Unknown words
+from player input are never added, so it only grows with the game's own words.'''
+
+def wordId(s):
+	'''Return the interned integer id of synonym s, assigning a new one if s hasn't
+	been seen yet.
+	
+	s : str
+	
+	returns : int'''
+	try:
+		return wordIds[s]
+	except KeyError:
+		i = wordIds[s] = len(wordIds)
+		return i
 
 class Lib(object):
 	"""A collection of words that handles parsing sentences. Use standardlib.standardLib()
@@ -24,35 +43,360 @@ class Lib(object):
 	
 	words = []
 	
+	cacheSize = 256
+	'''Maximum number of parse results to keep in cache, 0 disables caching.'''
+	
+	correct = False
+	'''True if unknown tokens are replaced before matching when suggest finds
+	exactly one token they could be a misspelling of, and that token is only
+	used by nouns, see isNounToken. Other words are left alone, as sentence
+	patterns may use tokens that aren't in the library. Replacements are listed
+	in Sentence.corrections.'''
+	suggestionLength = 4
+	'''Shortest token suggest looks for. Shorter tokens are within one edit of
+	too many words for a guess to be of any use.'''
+	
 	def __init__(self, *words):
 		'''Create new Lib instance.
 		
 		*words : *Word - Words to append to library.'''
-		self.words = []
+		self.words = {}
+		'''Maps the words in the library to serial numbers telling the order they
+		were appended in.'''
+		self.serial = 0
+		'''Serial number of the next appended word.'''
+		self.synonyms = {}
+		'''Maps every synonym, wildcards like "*noun" included, to a dict of the
+		words having it and their serial numbers.'''
+		self.trie = {}
+		'''Token trie of every synonym in the library. Each node maps a token to
+		the next node, None maps to a list of synonyms ending there.'''
+		self.vocabulary = Vocabulary()
+		'''Tokens of the synonyms in the library, for finding misspelled words.'''
+		self.otherTokens = {}
+		'''Number of synonyms of the words other than nouns using each token, see
+		isNounToken.'''
+		self.nounPrefixes = PrefixIndex()
+		'''Synonyms of the nouns in the library, for complete.'''
+		self.otherPrefixes = PrefixIndex()
+		'''Synonyms of the other words in the library but Ignore words, for complete.'''
+		self.ignored = []
+		'''Ignore words in the library.'''
+		self.ignoredTokens = set()
+		'''Synonyms of the Ignore words, dropped from sentences before matching.'''
+		self.version = 0
+		'''Incremented whenever words are added, removed or change their synonyms.
+		Wildcard synonyms like "*self" don't count, as they can't appear in input.'''
+		self.cache = OrderedDict()
+		'''Parse results by sanitized string and version, least recently used first.'''
+		self.hits = 0
+		'''Number of parses answered from cache.'''
+		self.misses = 0
+		'''Number of parses not found in cache.'''
 		self.append(*words)
 		
 	def readScript(self, script):
 		"""Read script nodes as synonyms. Unimplemented."""
 	
 	def remove(self, *words):
-		"""Remove argument words from library."""
+		"""Remove argument words from library. Strings remove the first word having
+		them as a synonym."""
 		for word in words:
-			for i in range(0, len(self)):
-				if self.words[i].eqString(word):
-					del self.words[i]
-					break
+			if type(word) in (str, unicode):
+				word = self[word]
+			if word in self.words:
+				self.release(word)
+				del self.words[word]
+				self.version += 1
 	
 	def clear(self):
 		"""Completely clears library of all words."""
-		self.words = []
+		for word in self.words:
+			self.release(word)
+		self.words = {}
+		self.ignored = []
+		self.ignoredTokens = set()
+		self.version += 1
 		
 	def append(self, *words):
 		"""Add argument *words to libary."""
-		self.words.extend(words)
+		for word in words:
+			if word in self.words:
+				continue
+			self.words[word] = self.serial
+			self.serial += 1
+			word.libs += (self,)
+			self.index(word, word.words)
+			if type(word) == Ignore:
+				self.ignored.append(word)
+				self.updateIgnored()
+		self.version += 1
+	
+	def release(self, word):
+		'''Remove word from the index and stop listening to its changes.'''
+		self.unindex(word, word.words)
+		word.libs = tuple([l for l in word.libs if l is not self])
+		if type(word) == Ignore:
+			self.ignored = [w for w in self.ignored if w is not word]
+			self.updateIgnored()
+	
+	def updateIgnored(self):
+		'''Rebuild ignoredTokens from the Ignore words.'''
+		self.ignoredTokens = set()
+		for word in self.ignored:
+			self.ignoredTokens.update(word)
+	
+	def prefixes(self, word):
+		'''Return the PrefixIndex for the synonyms of word, None for Ignore words.'''
+		if isinstance(word, Noun):
+			return self.nounPrefixes
+		elif isinstance(word, Ignore):
+			return None
+		return self.otherPrefixes
+	
+	def index(self, word, synonyms):
+		'''Add synonyms of word into the synonym index, the token trie and the
+		prefix indexes.'''
+		prefixes = self.prefixes(word)
+		for synonym in synonyms:
+			if prefixes is not None and synonym[:1] != '*':
+				prefixes.add(synonym)
+			if not isinstance(word, Noun) and synonym[:1] != '*':
+				for token in synonym.split():
+					self.otherTokens[token] = self.otherTokens.get(token, 0) + 1
+			try:
+				self.synonyms[synonym][word] = self.words[word]
+			except KeyError:
+				self.synonyms[synonym] = {word: self.words[word]}
+				node = self.trie
+				for token in synonym.split():
+					node = node.setdefault(token, {})
+					if token[:1] != '*':
+						self.vocabulary.add(token)
+				node.setdefault(None, []).append(synonym)
+	
+	def unindex(self, word, synonyms):
+		'''Remove synonyms of word from the synonym index, the token trie and the
+		prefix indexes.'''
+		prefixes = self.prefixes(word)
+		for synonym in synonyms:
+			d = self.synonyms.get(synonym)
+			if d is None or word not in d:
+				continue
+			del d[word]
+			if prefixes is not None and synonym[:1] != '*':
+				prefixes.remove(synonym)
+			if not isinstance(word, Noun) and synonym[:1] != '*':
+				for token in synonym.split():
+					n = self.otherTokens[token] - 1
+					if n:
+						self.otherTokens[token] = n
+					else:
+						del self.otherTokens[token]
+			if d:
+				continue
+			
+			del self.synonyms[synonym]
+			path = [(None, self.trie)]
+			for token in synonym.split():
+				path.append((token, path[-1][1][token]))
+				if token[:1] != '*':
+					self.vocabulary.remove(token)
+			node = path[-1][1]
+			node[None].remove(synonym)
+			if not node[None]:
+				del node[None]
+			
+			# prune nodes left empty
+			for k in range(len(path)-1, 0, -1):
+				if path[k][1]:
+					break
+				del path[k-1][1][path[k][0]]
+	
+	def update(self, word, old):
+		'''Called by word after its synonyms have changed.
+		
+		word : Word
+		old : tuple - Synonyms before the change.'''
+		removed = [s for s in old if s not in word.words]
+		added = [s for s in word.words if s not in old]
+		self.unindex(word, removed)
+		self.index(word, added)
+		if type(word) == Ignore:
+			self.updateIgnored()
+		for s in removed + added:
+			if s[:1] != '*':
+				self.version += 1
+				break
+		
+	def lookup(self, synonym):
+		'''Find words by synonym. Wildcards such as "*noun" return every word of
+		that class.
+		
+		synonym : str
+		
+		returns : list of Words in the order they were appended'''
+		d = self.synonyms.get(synonym)
+		if not d:
+			return []
+		elif len(d) == 1:
+			return d.keys()
+		return sorted(d, key=d.__getitem__)
+	
+	def isNounToken(self, token):
+		'''Return True if token is only used in the synonyms of nouns.'''
+		return token in self.vocabulary and token not in self.otherTokens
+	
+	def nounTokens(self, scope):
+		'''Return the tokens of the synonyms of the nouns in scope.
+		
+		scope : set of Words
+		
+		returns : set of str'''
+		tokens = set()
+		for word in scope:
+			if isinstance(word, Noun):
+				for synonym in word.words:
+					if synonym[:1] != '*':
+						tokens.update(synonym.split())
+		return tokens
+	
+	def suggest(self, token, scope=None):
+		'''Find the tokens in the library token could be a misspelling of, see
+		Vocabulary.suggest.
+		
+		token : str
+		scope : set of Words - If given, tokens only used by nouns are suggested
+			when a noun in scope has them, so suggestions don't name items the
+			player hasn't come across.
+		
+		returns : list of str, empty if token is known or shorter than
+			suggestionLength'''
+		if len(token) < self.suggestionLength or token in self.vocabulary:
+			return []
+		l = self.vocabulary.suggest(token)
+		if scope is not None and l:
+			tokens = self.nounTokens(scope)
+			l = [t for t in l if t in tokens or not self.isNounToken(t)]
+		return l
+	
+	def complete(self, s, scope=None, limit=10):
+		'''Complete the last word of input s with the synonyms in the library. When
+		the first word is completed other words are listed before nouns, otherwise
+		nouns come first, followed by the adjectives of the nouns. Synonyms of
+		several tokens, like "pick up", are completed from any of the tokens they
+		start with, and listed before the shorter completions. After adjectives
+		only the nouns having them and their other adjectives are completed.
+		
+		s : str - Input being typed.
+		scope : set of Words - If given, only nouns in scope and their adjectives
+			are completed. Otherwise adjectives come from every noun in the
+			library.
+		limit : int - Maximum number of completions.
+		
+		returns : list of str - Copies of s with the last word completed.'''
+		spans = [m.span() for m in Sentence.tokenPattern.finditer(s.lower())]
+		if not spans or s[-1:].isspace():
+			spans.append((len(s), len(s)))
+		
+		if len(spans) > 1:
+			l = self.completeAdjectives(s, spans, scope)
+			if l is not None:
+				return l[:limit]
+		
+		found = []
+		seen = set()
+		for k in range(min(3, len(spans)), 0, -1):
+			start = spans[-k][0]
+			prefix = ' '.join([s[i:j] for i, j in spans[-k:]]).lower()
+			
+			if scope is None:
+				nouns = self.nounPrefixes.find(prefix, limit)
+			else:
+				nouns = set()
+				for word in scope:
+					if isinstance(word, Noun):
+						nouns.update([synonym for synonym in word.words if synonym.startswith(prefix) and synonym[:1] != '*'])
+				nouns = sorted(nouns)[:limit]
+			others = self.otherPrefixes.find(prefix, limit)
+			
+			if len(spans) == k:
+				l = others + nouns
+			elif k == 1:
+				l = nouns + self.adjectiveCompletions(prefix, scope) + others
+			else:
+				l = nouns + others
+			for synonym in l:
+				completion = s[:start] + synonym
+				if completion not in seen:
+					seen.add(completion)
+					found.append(completion)
+			if len(found) >= limit:
+				break
+		return found[:limit]
+	
+	def adjectiveCompletions(self, prefix, scope=None, adjectives=()):
+		'''Find the adjective tokens of nouns starting with prefix.
+		
+		prefix : str
+		scope : set of Words - Nouns to look in, every noun in the library if
+			not given.
+		adjectives : sequence of str - Adjective tokens the nouns must have, left
+			out of the completions.
+		
+		returns : sorted list of str'''
+		if scope is None:
+			scope = self.lookup('*noun')
+		found = set()
+		for word in scope:
+			if isinstance(word, Noun) and word.adjective is not None:
+				tokens = word.adjectiveTokens()
+				for token in adjectives:
+					if token not in tokens:
+						break
+				else:
+					found.update([t for t in tokens if t.startswith(prefix)])
+		return sorted(found.difference(adjectives))
+	
+	def completeAdjectives(self, s, spans, scope=None):
+		'''Complete the last word of input s when adjectives of nouns precede it,
+		see complete. Adjectives are looked for after the first word only.
+		
+		returns : list of str - None if the word before the last isn't an
+			adjective.'''
+		tokens = [s[i:j].lower() for i, j in spans]
+		if scope is None:
+			scope = self.lookup('*noun')
+		nouns = [word for word in scope if isinstance(word, Noun) and word.adjective is not None]
+		
+		k = len(tokens) - 1
+		candidates = nouns
+		while k > 1:
+			l = [word for word in candidates if tokens[k-1] in word.adjectiveTokens()]
+			if not l:
+				break
+			candidates = l
+			k -= 1
+		if k == len(tokens) - 1:
+			return None
 		
+		prefix = tokens[-1]
+		synonyms = set()
+		for word in candidates:
+			synonyms.update([synonym for synonym in word.words if synonym.startswith(prefix) and synonym[:1] != '*'])
+		l = sorted(synonyms) + self.adjectiveCompletions(prefix, candidates, tokens[k:-1])
+		
+		start = spans[-1][0]
+		found = []
+		for synonym in l:
+			completion = s[:start] + synonym
+			if completion not in found:
+				found.append(completion)
+		return found
+	
 	def __iter__(self):
-		"""Iterate through words in the lib."""
-		return iter(self.words)
+		"""Iterate through words in the lib in the order they were appended."""
+		return iter(sorted(self.words, key=self.words.__getitem__))
 		
 	def __len__(self):
 		return len(self.words)
@@ -61,40 +405,319 @@ class Lib(object):
 		return '\n'.join(self.words)
 		
 	def __getitem__(self, name):
+		if type(name) in (str, unicode):
+			for word in self.lookup(name):
+				return word
+			return None
+		
 		for word in self:
 			if word == name:
 				return word
+	
+	def match(self, tokens, scope=None):
+		"""Find every synonym in the library contained in the token list. Walks the
+		trie once from every token, so the cost depends on the length of the input
+		and not on the size of the library.
+		
+		tokens : list of str - See Sentence.tokenize.
+		scope : set of Words - If given, nouns not in scope are only matched where
+			no noun in scope matches an overlapping span of tokens at least as
+			long.
+		
+		returns : list of Match instances"""
+		matches = []
+		outside = []
+		for i in range(len(tokens)):
+			node = self.trie
+			for j in range(i, len(tokens)):
+				node = node.get(tokens[j])
+				if node is None:
+					break
+				for synonym in node.get(None, ()):
+					for word in self.lookup(synonym):
+						start = word.matchPrefix(tokens, i)
+						if start != i:
+							matched = ' '.join(tokens[start:j+1])
+						else:
+							matched = synonym
+						match = Match(matched, word, start, j+1)
+						if scope is not None and isinstance(word, Noun) and word not in scope:
+							outside.append(match)
+						else:
+							matches.append(match)
+		
+		if outside:
+			nouns = [m for m in matches if isinstance(m.wordObject, Noun)]
+			for match in outside:
+				for m in nouns:
+					if m.y - m.x < match.y - match.x:
+						continue
+					if m.contradicts(match) or match.contradicts(m):
+						break
+				else:
+					matches.append(match)
+		
+		return matches
 		
-	def parse(self, sentence):
+	def parse(self, sentence, scope=None, reach=None):
 		"""Parse a sentence based on the words in this library.
 		
-		s : Sentence"""
+		s : Sentence
+		scope : set of Words - Nouns to prefer, see match. Parses with a scope
+			aren't cached.
+		reach : set of Words - Nouns misspelled tokens may be corrected to, see
+			correct and suggest. Any noun if not given."""
 		sentence.lib = self
-
-		matches = []
+		if self.correct:
+			self.correctTokens(sentence, reach)
 		
-		for word in self:
-			if type(word) == Ignore:
-				for word in word:
-					sentence.s = sentence.s.replace(word + ' ', '')
+		cached = self.cacheSize and scope is None and '*' not in sentence.s
+		if cached:
+			key = (sentence.s, self.version)
+			try:
+				result = self.cache.pop(key)
+			except KeyError:
+				self.misses += 1
+			else:
+				self.hits += 1
+				self.cache[key] = result
+				(sentence.s, sentence.tokens, sentence.words, sentence.roles, matches,
+					applied) = result
+				sentence.matches = list(matches)
+				sentence.appliedMatches = list(applied)
+				return
+		
+		ignored = self.ignoredTokens
+		if ignored:
+			sentence.tokens = [t for t in sentence.tokens if t not in ignored]
+			sentence.s = ' %s ' % ' '.join(sentence.tokens)
+		
+		sentence.applyMatches(self.match(sentence.tokens, scope))
+		
+		if cached:
+			if len(self.cache) >= self.cacheSize:
+				self.cache.popitem(False)
+			self.cache[key] = (sentence.s, sentence.tokens, sentence.words,
+				sentence.roles, tuple(sentence.matches), tuple(sentence.appliedMatches))
+	
+	def correctTokens(self, sentence, reach=None):
+		'''Replace the misspelled tokens of sentence, see correct. Done before the
+		parse cache is looked up, so the cache only sees the corrected input.
+		
+		sentence : Sentence
+		reach : set of Words - Nouns tokens may be corrected to, see suggest.'''
+		tokens = sentence.tokens
+		for i in range(len(tokens)):
+			if tokens[i] not in self.vocabulary:
+				l = self.suggest(tokens[i], reach)
+				if len(l) == 1 and self.isNounToken(l[0]):
+					sentence.corrections.append((tokens[i], l[0]))
+					tokens[i] = l[0]
+		if sentence.corrections:
+			sentence.s = ' %s ' % ' '.join(tokens)
+	
+	def __getstate__(self):
+		'''Parse results aren't saved.'''
+		d = self.__dict__.copy()
+		d['cache'] = OrderedDict()
+		return d
 		
-		for word in self:
-			match = word.containedIn(sentence.s)
-			
-			if match:
-				matches.extend(match)
 		
-		sentence.applyMatches(matches)
+class PrefixIndex(object):
+	'''Sorted list of strings, for finding the ones starting with a prefix by
+	binary search. A string added several times stays in the index until it has
+	been removed as many times.'''
+	
+	def __init__(self):
+		self.list = []
+		'''The strings in order.'''
+		self.counts = {}
+		'''Number of times each string has been added.'''
+	
+	def add(self, s):
+		'''Add s to the index.'''
+		try:
+			self.counts[s] += 1
+		except KeyError:
+			self.counts[s] = 1
+			bisect.insort(self.list, s)
+	
+	def remove(self, s):
+		'''Remove s from the index.'''
+		n = self.counts[s] - 1
+		if n:
+			self.counts[s] = n
+		else:
+			del self.counts[s]
+			del self.list[bisect.bisect_left(self.list, s)]
+	
+	def find(self, prefix, limit=None):
+		'''Find the strings starting with prefix.
+		
+		prefix : str
+		limit : int - Maximum number of strings to return.
+		
+		returns : list of str in order'''
+		l = self.list
+		i = bisect.bisect_left(l, prefix)
+		found = []
+		while i < len(l) and l[i].startswith(prefix):
+			if len(found) == limit:
+				break
+			found.append(l[i])
+			i += 1
+		return found
+	
+	def __len__(self):
+		return len(self.list)
+
+class Vocabulary(object):
+	'''Index of the tokens used by the synonyms of a Lib, for finding the tokens a
+	misspelled one was meant to be. Each token is filed under every string left
+	by deleting one of its characters. A token and a misspelling of it by one
+	insertion, deletion, substitution or swap of adjacent characters always
+	share one of those strings, so a lookup is a few dict accesses no matter
+	how large the vocabulary is.'''
+	
+	def __init__(self):
+		self.tokens = {}
+		'''Number of synonyms using each token.'''
+		self.deletions = {}
+		'''Sets of tokens by the strings left when deleting one of their
+		characters, or none.'''
+	
+	def add(self, token):
+		'''Add a use of token.'''
+		try:
+			self.tokens[token] += 1
+		except KeyError:
+			self.tokens[token] = 1
+			for key in deletions(token):
+				self.deletions.setdefault(key, set()).add(token)
+	
+	def remove(self, token):
+		'''Remove a use of token. The token is dropped from the index with its last
+		use.'''
+		n = self.tokens[token] - 1
+		if n:
+			self.tokens[token] = n
+			return
+		
+		del self.tokens[token]
+		for key in deletions(token):
+			l = self.deletions[key]
+			l.discard(token)
+			if not l:
+				del self.deletions[key]
+	
+	def suggest(self, token):
+		'''Find the tokens one edit away from token.
+		
+		token : str
 		
+		returns : sorted list of str'''
+		found = set()
+		for key in deletions(token):
+			found.update(self.deletions.get(key, ()))
+		found.discard(token)
+		return sorted([t for t in found if oneEdit(t, token)])
+	
+	def __contains__(self, token):
+		return token in self.tokens
+	
+	def __len__(self):
+		return len(self.tokens)
+
+def deletions(token):
+	'''Return token and the strings left by deleting one of its characters.
+	
+	token : str
+	
+	returns : set of str'''
+	l = set([token[:i] + token[i+1:] for i in range(len(token))])
+	l.add(token)
+	return l
+	
+def oneEdit(a, b):
+	'''Return True if a and b differ by at most one insertion, deletion,
+	substitution or swap of adjacent characters.
+	
+	a : str
+	b : str
+	
+	returns : bool'''
+	if abs(len(a) - len(b)) > 1:
+		return False
+	i = 0
+	while i < len(a) and i < len(b) and a[i] == b[i]:
+		i += 1
+	if len(a) > len(b):
+		return a[i+1:] == b[i:]
+	elif len(a) < len(b):
+		return a[i:] == b[i+1:]
+	elif a[i+1:] == b[i+1:]:
+		return True
+	return a[i] == b[i+1:i+2] and a[i+1:i+2] == b[i] and a[i+2:] == b[i+2:]
 		
-class Word(object):
-	'''Superclass for all words.'''
-	name = ''
-	words = ()
+class Slotted(object):
+	'''Base class for the classes using __slots__ to save memory. Pickles the
+	values of all slots.'''
+	__slots__ = ()
+	
+	def __getstate__(self):
+		d = {}
+		for cls in self.__class__.__mro__:
+			for name in cls.__dict__.get('__slots__', ()):
+				if hasattr(self, name):
+					d[name] = getattr(self, name)
+		d.update(getattr(self, '__dict__', {}))
+		return d
+	
+	def __setstate__(self, d):
+		for name, value in d.items():
+			setattr(self, name, value)
+	
+class WordMeta(type):
+	'''Metaclass for Word. Computes the wildcards and the class bitmask of every
+	word class once, when the class is created.'''
+	
+	bits = {}
+	'''Bit of every class wildcard, eg. "*verb".'''
+	
+	def __init__(cls, name, bases, d):
+		type.__init__(cls, name, bases, d)
+		l = []
+		for base in bases:
+			# the wildcard of Word itself isn't inherited
+			if isinstance(base, WordMeta) and base.__bases__ != (Slotted,):
+				for wildcard in base.classWildcards:
+					if wildcard not in l:
+						l.append(wildcard)
+		l.append('*' + name.lower())
+		cls.classWildcards = tuple(l)
+		
+		cls.classMask = 0
+		for wildcard in cls.wildcards():
+			if wildcard not in WordMeta.bits:
+				WordMeta.bits[wildcard] = 1 << len(WordMeta.bits)
+			cls.classMask |= WordMeta.bits[wildcard]
+	
+class Word(Slotted):
+	'''Superclass for all words. Words use __slots__, so subclasses should
+	declare __slots__ as well to stay compact.'''
+	__metaclass__ = WordMeta
+	__slots__ = ('words', 'libs', 'ids')
+	
 	def __init__(self, *words):
 		"""Construct Word with *words specified as synonyms.
 		
 		words : a list of strings or a list"""
+		self.words = ()
+		'''Synonyms of the word, the first one is its name.'''
+		self.libs = ()
+		'''Libs this word has been appended to. Notified whenever synonyms change.'''
+		self.ids = frozenset()
+		'''Interned ids of all synonyms, see wordId.'''
 		
 		if words:
 			self.name = words
@@ -111,6 +734,7 @@ class Word(object):
 		self.setWords(value)
 		
 	def setWords(self, value):
+		old = self.words
 		if value:
 			words = value
 			l=[]
@@ -122,40 +746,61 @@ class Word(object):
 						l.append(w)
 
 			for word in l:
-				s = word
-				s = s.replace('the ', '')
-				s = s.replace('a ', '')
-				s = s.replace('an ', '')
-				if s != word:
+				tokens = word.split(' ')
+				s = ' '.join([t for t in tokens if t not in articles])
+				if len(s) != len(word) and s:
 					l.append(s)
 			
 			l.extend(self.__class__.wildcards())
 			self.words = tuple(l)
 		else:
 			self.words = value
+		self.changed(old)
+	
+	def changed(self, old):
+		'''Update all libs containing this word after its synonyms have changed.
+		
+		old : tuple - Synonyms before the change.'''
+		self.ids = self.synonymIds()
+		for lib in self.libs:
+			lib.update(self, old)
 
+	def synonymIds(self):
+		'''Return the ids of the synonyms, interning new ones with wordId.
+		
+		returns : frozenset of int'''
+		return frozenset([wordId(s) for s in self.words or ()])
+	
 	@classmethod
 	def wildcards(cls):
-		l = []
-		for base in cls.__bases__:
-			if base != Word and base != object:
-				l.extend(base.wildcards())
-		l.append('*' + cls.__name__.lower())
-		return l
+		'''returns : tuple - Wildcards added to the synonyms of every word of this
+		class, eg. ("*verb", "*touch") for Touch.'''
+		return cls.classWildcards
+	
+	def isA(self, wildcard):
+		'''Check the class of the word against a class wildcard such as "*verb"
+		with a single bit test.
+		
+		returns : bool'''
+		return bool(self.classMask & WordMeta.bits.get(wildcard, 0))
 		
 	def addWord(self, s):
 		"""Add new synonym.
 		
 		s : str"""
+		old = self.words
 		self.words = self.words+(s,)
+		self.changed(old)
 	
 	def removeWord(self, s):
 		"""Remove synonym.
 		
 		s : str"""
+		old = self.words
 		l = list(self.words)
 		l.remove(s)
 		self.words = tuple(l)
+		self.changed(old)
 		
 	def sortWords(self, l):
 		"""Sort words according to length, longest to shortest."""
@@ -170,47 +815,48 @@ class Word(object):
 		
 		returns : bool'''
 		if type(other) in (str, unicode):
-			return self.eqString(other)
+			if other in WordMeta.bits and self.words:
+				return self.isA(other)
+			return wordIds.get(other) in self.ids
 		
 		if issubclass(other.__class__, Word):
-			for oword in other:
-				if self.eqString(oword):
-					return True
+			return not self.ids.isdisjoint(other.ids)
 		
 		return False
 		
 	def __ne__(self, other):
-		return self.__eq__(other)*-1+1 == True
+		return not self.__eq__(other)
+	
+	def __getstate__(self):
+		'''Synonym ids are only valid in the running process, leave them out.'''
+		d = Slotted.__getstate__(self)
+		d.pop('ids', None)
+		return d
+	
+	def __setstate__(self, d):
+		Slotted.__setstate__(self, d)
+		self.ids = self.synonymIds()
 			
 	def __iter__(self):
 		"""Iterate through every synonym of Word."""
 		return iter(self.words)
 		
-	def containedIn(self, s):
-		l = []
-		for word in self:
-			l.extend(self.matchString(word, s))
-		return l
-						
-	def matchString(self, word, s):
-		"""Checks if string s contains word.
+	def matchPrefix(self, tokens, i):
+		"""Called by Lib.match after a synonym has been found at tokens[i]. Return
+		the index the match should start from instead.
 		
-		word : string
-		s : string
+		tokens : list of str
+		i : int
 		
-		returns : Match instance"""
-		return matchWord(word,s,self)
+		returns : int"""
+		return i
 
 	def __str__(self):
 		return self.name
 		
 	def eqString(self, s):
-		"""Matches every synonym against string s."""
-		for word in self:
-			if word == s:
-				return True
-				
-		return False
+		"""Check whether s is a synonym of this word."""
+		return wordIds.get(s) in self.ids
 	
 	@property
 	def isTitle(self):
@@ -232,25 +878,36 @@ class Word(object):
 		
 class Verb(Word):
 	'''Superclass for all verbs.'''
+	__slots__ = ()
 class CloseVerb(Verb):
 	'''Used for verbs that require you to be close to something.'''
+	__slots__ = ()
 class Touch(CloseVerb):
 	'''Used for verbs that require you to touch its object.'''
+	__slots__ = ()
 class Attack(Touch):
 	'''Used for aggressive verbs that require you to attack object.'''
+	__slots__ = ()
 class Move(Touch):
 	'''Used for verbs that attempt to move things.'''
+	__slots__ = ()
 class Social(CloseVerb):
 	'''Used for verbs that attempt social interaction.'''
+	__slots__ = ()
 class SocialTouch(Touch, Social):
 	'''Used for social touching verbs.'''
+	__slots__ = ()
 class Answer(Social):
 	'''Used for verbs that answer NPC's questions.'''
+	__slots__ = ()
 class Direction(Word):
 	'''Used for defining movement directions.'''
+	__slots__ = ()
 	
 class Noun(Word):
 	'''Superclass for all nouns.'''
+	__slots__ = ('_adjective', 'item', 'definite', 'indefinite')
+	
 	def __init__(self, *words):
 		Word.__init__(self, *words)
 		self.adjective = None
@@ -288,154 +945,286 @@ class Noun(Word):
 			self.definite = None
 			self.indefinite = None
 		
-	def matchString(self, word, s):
-		"""Recursive function for matching argument word and all Noun instance's
-		adjectives against argument s. 
-		
-		word : string
-		s : string
-		
-		returns : Match instance or None if failed"""
+	def matchPrefix(self, tokens, i):
+		"""Extend the match over any adjectives preceding it."""
 		if self.adjective == None:
-			return Word.matchString(self, word, s)
-		else:
-			matches = matchWord(word, s, self)
-			for match in matches:
-				for a in self.adjective:
-					newWord = a+' '+word # construct new string prefixed with an adjective
-					match = self.matchString(newWord, s) # match new string
-					if match:
-						return match
-						
-			if matches:
-				return [matches[0]]
+			return i
+		
+		table = self.adjective.tokenTable()
+		while i > 0:
+			for a in table.get(tokens[i-1], ()):
+				if i >= len(a) and tokens[i-len(a):i] == a:
+					i -= len(a)
+					break
 			else:
-				return matches
-			
-				
-			
+				break
+		return i
+	
+	@property
+	def adjective(self):
+		'''Adjective - Adjectives that can precede the noun in input. Can be set to
+		an Adjective, a string or a tuple of strings.'''
+		return self._adjective
+	
+	@adjective.setter
+	def adjective(self, value):
+		if not value:
+			value = None
+		elif not isinstance(value, Adjective):
+			value = Adjective(value)
+		self._adjective = value
+		for lib in self.libs:
+			lib.version += 1
+	
+	def adjectiveTokens(self):
+		'''Return the set of the tokens of the adjectives of the noun.'''
+		tokens = set()
+		if self.adjective != None:
+			for l in self.adjective.tokenTable().values():
+				for a in l:
+					tokens.update(a)
+		return tokens
+	
+	def describedBy(self, tokens):
+		'''Check whether every token is part of a synonym or an adjective of the
+		noun, eg. "brass" or "small key" for "small brass key". Articles are
+		skipped.
+		
+		tokens : list of str
+		
+		returns : bool'''
+		known = set()
+		for synonym in self:
+			if synonym[:1] != '*':
+				known.update(synonym.split())
+		known.update(self.adjectiveTokens())
+		
+		tokens = [t for t in tokens if t not in articles]
+		for token in tokens:
+			if token not in known:
+				return False
+		return len(tokens) > 0
+		
 	def __eq__(self, other):
-		if type(other) == str:
-			l = Lib()
-			l.append(self)
-			if self.adjective != None:
-				l.append(self.adjective)
-			s = Sentence(other)
-			l.parse(s)
-			if len(s) == 1 and s[0] == self:
+		'''other : str / Word - Strings match if they are a synonym of the noun,
+		optionally preceded by adjectives.
+		
+		returns : bool'''
+		if type(other) in (str, unicode):
+			if wordIds.get(other) in self.ids:
 				return True
-			else:
-				return False
+			
+			tokens = Sentence.tokenize(other)
+			for synonym in self:
+				l = synonym.split()
+				i = len(tokens) - len(l)
+				if i >= 0 and tokens[i:] == l and self.matchPrefix(tokens, i) == 0:
+					return True
+			return False
 		else:
 			return Word.__eq__(self, other)
 	
 class Location(Noun):
 	'''Used for nouns that define physical locations in a room.'''
+	__slots__ = ()
 class Creature(Noun):
 	'''Used for all living creatures.'''
+	__slots__ = ()
 class Person(Creature):
 	'''Used for people.'''
+	__slots__ = ()
 class Animal(Creature):
 	'''Used for animals.'''
+	__slots__ = ()
 
 class Adjective(Word):
 	'''Superclass for all adjectives.'''
+	__slots__ = ('table',)
+	
+	def __init__(self, *words):
+		self.table = None
+		Word.__init__(self, *words)
+	
+	def changed(self, old):
+		self.table = None
+		Word.changed(self, old)
+	
+	def tokenTable(self):
+		'''Map the last token of every synonym to the synonyms ending in it as token
+		lists. Built on first use after the synonyms change, and shared by every
+		noun using this adjective.
+		
+		returns : dict'''
+		if self.table is None:
+			table = {}
+			for synonym in self:
+				if synonym[:1] != '*':
+					tokens = synonym.split()
+					table.setdefault(tokens[-1], []).append(tokens)
+			self.table = table
+		return self.table
 class Preposition(Word):
 	'''Superclass for all prepositions.'''
+	__slots__ = ()
+class Multiple(Word):
+	'''Words standing for every suitable object, like "all".'''
+	__slots__ = ()
+class Conjunction(Word):
+	'''Words joining objects into a list, like "and".'''
+	__slots__ = ()
+class Exclusion(Word):
+	'''Words leaving the objects after them out of a list, like "except".'''
+	__slots__ = ()
 class Ignore(Word):
 	'''Words for the parser to ignore during parsing.'''
+	__slots__ = ()
 class Internal(Word):
 	'''Reserved for keywords like "save", "load", "again".'''
+	__slots__ = ()
 class Unknown(Word):
-	'''Instantiated for any words in the sentence that the parser doesn't understand.'''
+	'''Instantiated for any words in the sentence that the parser doesn't understand.
+	Its tokens come from player input, so they aren't interned. ids only holds the
+	ids of tokens some other word or grammar frame has interned already, and
+	comparisons with strings and other unknown words go by the strings.'''
+	__slots__ = ()
 	@classmethod
 	def wildcards(cls):
-		return []
+		return ()
+	
+	def synonymIds(self):
+		return frozenset([wordIds[s] for s in self.words or () if s in wordIds])
+	
+	def __eq__(self, other):
+		if type(other) in (str, unicode):
+			if other in WordMeta.bits and self.words:
+				return self.isA(other)
+			return other in (self.words or ())
+		
+		if isinstance(other, Unknown):
+			return not set(self.words or ()).isdisjoint(other.words or ())
+		return Word.__eq__(self, other)
+	
+	def eqString(self, s):
+		return s in (self.words or ())
 
-class Sentence:
+class Sentence(Slotted):
 	'''Container object for word instances.'''
+	__slots__ = ('tokens', 's', 'words', 'appliedMatches', 'matches', 'lib', 'actor',
+		'occupied', 'spans', 'position', 'roles', 'tree', 'corrections')
+	
+	tokenPattern = re.compile(r'[^\s,.]+')
+	'''Matches a single token. Whitespace, commas and periods separate tokens.'''
+	
 	def __init__(self, s):
-		self.s = Sentence.sanitize(s)
+		self.tokens = Sentence.tokenize(s)
+		'''Lowercase words of the input, see tokenize.'''
+		self.s = ' %s ' % ' '.join(self.tokens)
+		'''The tokens joined into a string, padded with spaces.'''
 		
 		self.words = []
 		self.appliedMatches = []
+		self.roles = None
+		'''Roles of the words, see index.'''
+		self.tree = None
+		'''ParseTree of the sentence when the game has a grammar, see Game.grammar.'''
+		self.corrections = []
+		'''(token, replacement) pairs of the misspelled tokens replaced, see
+		Lib.correct.'''
 		
 	@classmethod
-	def sanitize(cls, s):
-		'''Sanitize string s for parsing.'''
-		s = s.lower()
-		s = ' ' + s + ' '		
-		
-		while '  ' in s:
-			s = s.replace('  ', ' ')
-		s = s.replace(',','')
-		s = s.replace('.','')
+	def tokenize(cls, s):
+		'''Split string s into lowercase tokens in a single pass.
 		
-		return s
+		s : str
 		
+		returns : list of str'''
+		return cls.tokenPattern.findall(s.lower())
+	
+	@classmethod
+	def sanitize(cls, s):
+		'''Sanitize string s for parsing.'''
+		return ' %s ' % ' '.join(cls.tokenize(s))
+		
+	def index(self):
+		'''Return the role index of the word list. It is built once the sentence
+		has been finalized, and again only if the words are replaced.
+		
+		returns : Roles'''
+		roles = self.roles
+		if roles is None or roles.words is not self.words:
+			roles = Roles(self.words)
+			if type(self.words) == tuple:
+				self.roles = roles
+		return roles
+	
 	@property
 	def nouns(self):
-		l = []
-		for word in self:
-			if word == '*noun':
-				l.append(word)
-		return l
+		'''tuple - The nouns in the sentence.'''
+		return self.index().nouns
 		
 	@property
 	def verbs(self):
-		l = []
-		for word in self:
-			if word == '*verb':
-				l.append(word)
-		
-		return l
+		'''tuple - The verbs in the sentence.'''
+		return self.index().verbs
 		
 	def applyMatches(self, matches):
-		"""Apply list of Match instances to sentence. 
+		"""Apply list of Match instances to sentence. Matches are taken from the
+		longest to the shortest, skipping any overlapping a match already applied.
+		Raises AmbiguityError if several words match the same span; matching can
+		then be continued with resumeMatching. Words left unmatched become Unknown
+		words.
 		
 		matches : list of Match instances"""
+		self.matches = matches
 		
-		def available(l, match):
-			for matched in l: # go through all the matched words
-				if matched.contradicts(match):
-					return False
-					
-			return True
+		self.occupied = [False] * len(self.tokens)
+		'''True for every token covered by an applied match.'''
+		for match in self.appliedMatches:
+			self.occupied[match.x:match.y] = [True] * (match.y-match.x)
+		
+		matches.sort(key = lambda x: -len(x)) # sort from longest match to the shortest
+		self.spans = {}
+		'''Matches by their token span.'''
+		for match in matches:
+			self.spans.setdefault((match.x, match.y), []).append(match)
+		self.position = 0
+		'''Index of the next match to apply.'''
+		
+		self.resumeMatching()
+	
+	def resumeMatching(self, choice=None):
+		"""Continue applying matches from where the last AmbiguityError stopped.
+		Matches applied before it are kept.
+		
+		choice : Match - The match chosen for the ambiguous span."""
+		occupied = self.occupied
+		if choice is not None:
+			occupied[choice.x:choice.y] = [True] * (choice.y-choice.x)
+			self.applyMatch(choice)
+		
+		matches = self.matches
+		while self.position < len(matches):
+			match = matches[self.position]
+			self.position += 1
+			i, j = match.x, match.y
+			if True in occupied[i:j]:
+				continue
 			
-		self.matches = matches
+			if match.s[0] != '*':
+				l = self.spans[i, j]
+				if len(l) > 1:
+					raise AmbiguityError(l, self, matches[self.position:])
 			
-		matches.sort(key = lambda x: -len(x)) # sort from longest match to the shortest
-		for i in range(0, len(matches)):
-			if available(self.appliedMatches, matches[i]):
-				l = []
-				if matches[i].s[0] != '*':
-					try:
-						x = i
-						while matches[x] == matches[i]:
-							l.append(matches[x])
-							x += 1
-						
-					except IndexError:
-						pass
-					
-					if l != [matches[i]]:
-						raise AmbiguityError(l, self, matches[i+len(l):])
-				self.applyMatch(matches[i])
-				
+			occupied[i:j] = [True] * (j-i)
+			self.applyMatch(match)
+		
 		# turn rest of the words into word instances
-		singleWords = self.s.split(' ')
-		for word in singleWords:
-			if word != '': # ignore empty strings in the beginning and end
-				u = Unknown(word)
-				'''if word[0] == '*':
-					u.addWord(word)'''
-				match = Match(word, self.s, u, self.s.index(word)-1)
-
-				# see if word hasn't been matched by a better word
-				if available(self.appliedMatches, match): 
-					self.applyMatch(match) 
-					
-				
+		for i in range(len(self.tokens)):
+			if not occupied[i]:
+				word = self.tokens[i]
+				self.applyMatch(Match(word, Unknown(word), i, i+1))
+		
+		self.occupied = self.spans = None
 		self.finalize()
 		
 	def applyMatch(self, match):
@@ -443,14 +1232,15 @@ class Sentence:
 		self.words.append(match)
 		self.appliedMatches.append(match)
 		
-		self.words.sort(key = lambda i: i.x)
-		
 	def finalize(self):
-		"""Finalize word list - turn match instances into words."""
+		"""Finalize word list - turn match instances into words, ordered by their
+		position in the sentence."""
+		self.words.sort(key = lambda i: i.x)
 		l = []
 		for word in self.words:
 			l.append(word.wordObject)
 		self.words = tuple(l)
+		self.roles = Roles(self.words)
 		
 	def __str__(self):
 		s = ''
@@ -485,15 +1275,18 @@ class Sentence:
 			l.append(word)
 		
 		s = Sentence(s)
-		l.parse(s)
+		try:
+			l.parse(s)
+		finally:
+			l.clear()
 		return s
 		
 	def __eq__(self, other):
-		'''other : str / Sentence - Parses strings into a sentence according to the 
-		word list. Sentence is matched by matching all Words against each other, skipping
+		'''other : str / Sentence - Strings are compiled into a Pattern and matched
+		against the word list. Sentence is matched by matching all Words against each other, skipping
 		Ignored words. Raises Exception if trying to compare to other objects.'''
 		if type(other) in (str, unicode):
-			other = self.parseString(other)
+			return Pattern.compile(other).match(self.words)
 		elif issubclass(other.__class__, Word):
 			if len(self) != 1:
 				return False
@@ -531,9 +1324,16 @@ class Sentence:
 		return self.__eq__(other) == False
 		
 	def __getslice__(self, start, end):
-		'''Create a new sentence with the words from the slice.'''
-		sentence = Sentence(self.s)
+		'''Create a new sentence with the words from the slice. The tokens are
+		shared with this sentence and nothing is parsed again.'''
+		sentence = Sentence.__new__(Sentence)
+		sentence.tokens = self.tokens
+		sentence.s = self.s
 		sentence.words = self.words[start:end]
+		sentence.appliedMatches = []
+		sentence.roles = None
+		sentence.tree = None
+		sentence.corrections = self.corrections
 		return sentence
 		
 	def __contains__(self, other):
@@ -548,27 +1348,109 @@ class Sentence:
 				
 		return False
 
-def matchWord(word, s, wordObject):
-	w = ' %s ' % word
-	e = []
-	l = s.rsplit(w,1)
-	while len(l) > 1:
-		e.append(Match(word, s, wordObject, max(len(l[0])-1, 0)))
-		l.pop()
-		l[0] += ' '
-		l = l[0].rsplit(w,1)
-		
-	return e
-		
-class Match(object):
+class Roles(Slotted):
+	'''Index of the roles of the words in a sentence, built by Sentence.index.'''
+	__slots__ = ('words', 'tags', 'nouns', 'verbs', 'content')
+	
+	def __init__(self, words):
+		self.words = words
+		'''The words the index was built from.'''
+		self.tags = tuple([getattr(word, 'classMask', 0) for word in words])
+		'''Class bitmask of every word, see WordMeta.'''
+		self.nouns = tuple([word for word in words if word == '*noun'])
+		self.verbs = tuple([word for word in words if word == '*verb'])
+		self.content = tuple([i for i in range(len(words)) if words[i].__class__ != Ignore])
+		'''Positions of the words that aren't Ignore words.'''
+	
+class Pattern(object):
+	'''A sentence pattern such as "take *self", compiled once into a tuple of tokens.
+	A sentence matches the pattern if its words can be read from the tokens in order,
+	each word consuming one of its synonyms.'''
+	
+	cache = {}
+	'''Compiled patterns by pattern string.'''
+	cacheSize = 1000
+	'''Maximum number of patterns to keep in cache.'''
+	
+	def __init__(self, s):
+		self.s = s
+		self.tokens = tuple(Sentence.tokenize(s))
+	
+	@classmethod
+	def compile(cls, s):
+		'''Return the cached Pattern for string s, compiling it if needed.
+		
+		s : str
+		
+		returns : Pattern'''
+		try:
+			return cls.cache[s]
+		except KeyError:
+			if len(cls.cache) >= cls.cacheSize:
+				cls.cache.clear()
+			pattern = cls.cache[s] = cls(s)
+			return pattern
+	
+	def match(self, words, i=0, k=0):
+		'''Match the tokens of this pattern starting from i against words starting
+		from k. Ignore words are skipped. Nouns may also consume any of their
+		adjectives before the synonym, as in input.
+		
+		words : tuple of Words
+		
+		returns : bool'''
+		tokens = self.tokens
+		while k < len(words) and words[k].__class__ == Ignore:
+			k += 1
+		if k == len(words):
+			return i == len(tokens)
+		if i == len(tokens):
+			return False
+		
+		for synonym in words[k]:
+			n = synonym.count(' ') + 1
+			if n == 1:
+				if tokens[i] != synonym:
+					continue
+			elif ' '.join(tokens[i:i+n]) != synonym:
+				continue
+			if self.match(words, i+n, k+1):
+				return True
+		
+		if isinstance(words[k], Noun) and words[k].adjective is not None:
+			for synonym in words[k].adjective:
+				if synonym[:1] == '*':
+					continue
+				n = synonym.count(' ') + 1
+				if ' '.join(tokens[i:i+n]) == synonym and self.match(words, i+n, k):
+					return True
+		
+		return False
+	
+	def __str__(self):
+		return self.s
+
+class Match(Slotted):
 	'''Used internally for matching strings in user input.'''
-	def __init__(self, word, s, wordObject, index):
+	__slots__ = ('s', 'x', 'y', 'wordObject')
+	
+	def __init__(self, word, wordObject, start, end):
+		'''word : str - The matched part of the input.
+		wordObject : Word
+		start : int - Index of the first matched token.
+		end : int - Index of the token after the match.'''
 		self.s = word
-		self.x = index
+		self.x = start
+		self.y = end
 		self.wordObject = wordObject
-		self.word = wordObject
-		self.length = len(word)
-		self.y = self.x + self.length
+	
+	@property
+	def word(self):
+		return self.wordObject
+	
+	@property
+	def length(self):
+		return len(self.s)
 		
 	def __nonzero__(self):
 		if self.length == 0:
@@ -590,11 +1472,17 @@ class Match(object):
 			return False
 			
 	def __eq__(self, other):
-		if self.x == other.x and self.y == other.y:
+		if not isinstance(other, Match):
+			return False
+		elif self.x == other.x and self.y == other.y:
 			return True
 		else:
 			return False
 		
+articles = ('the', 'a', 'an')
+'''Dropped from names to create additional synonyms, eg. "box of the dead" is
+also "box of dead".'''
+
 consonants = (
 	'b', 'c', 'd', 'f', 'g', 'h', 'j', 'k', 'l', 'm', 'n', 'p', 'q', 'r', 's', 't', 'u', 'v', 'w', 'x', 'z'
 )
@@ -37,10 +37,41 @@ class PropertyMeta(handler.HandlerMeta):
 	def name(cls, value):
 		cls._name = value
 
+class PropertyList(tuple):
+	'''Tuple of the properties of an item, indexed by name. Property classes are
+	found with a dictionary lookup instead of comparing every property in the
+	tuple, but otherwise match the same way as with Property.__eq__.'''
+	
+	def __new__(cls, props=()):
+		self = tuple.__new__(cls, props)
+		self.names = {}
+		'''The properties by name. The first one wins if two share a name.'''
+		self.classNames = set()
+		'''The __name__ of the class of every property, see Item.hasProp.'''
+		for prop in self:
+			self.names.setdefault(prop.name, prop)
+			self.classNames.add(prop.__class__.__name__)
+		return self
+	
+	def __contains__(self, prop):
+		if type(prop) is PropertyMeta:
+			return prop.name in self.names
+		for p in self:
+			if p is prop:
+				return True
+		return False
+	
+	def __add__(self, other):
+		return PropertyList(tuple.__add__(self, tuple(other)))
+
 class Property(handler.Handler):
 	'''Superclass for all properties.'''
 	__metaclass__ = PropertyMeta
 	
+	worldAttributes = ()
+	'''Attributes of the state that change what the actors can reach, such as
+	being open. Setting one of them calls handler.worldChanged.'''
+	
 	def __eq__(self, other):
 		if type(self) == other:
 			return True
@@ -49,6 +80,11 @@ class Property(handler.Handler):
 		else:
 			return False
 			
+	def __setattr__(self, name, value):
+		handler.Handler.__setattr__(self, name, value)
+		if name in self.worldAttributes:
+			handler.worldChanged()
+	
 	@property
 	def name(self):
 		return self.__class__.name
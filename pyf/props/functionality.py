@@ -172,20 +172,17 @@ class Wearable(Property):
 		
 	}
 	
+	sentences = (
+		(('strip', '*self'), 'strip'),
+		(('take', '*self', 'off'), 'strip'),
+		(("dress", '*self'), 'dress'),
+		(("put", '*self', 'on'), 'dress'),
+	)
+	
 	def __init__(self, worn=False):
 		Property.__init__(self)
 		self.worn = worn
 		
-	def handle(self, sentence, output):
-		if sentence == ('strip', '*self'):
-			self.strip(output)
-		elif sentence == ('take', '*self', 'off'):
-			self.strip(output)
-		elif sentence == ("dress", '*self'):
-			self.dress(output)
-		elif sentence == ("put", '*self', 'on'):
-			self.dress(output)
-		
 	def getDesc(self, type, desc):
 		if type == 'long':
 			if self.worn:
@@ -19,6 +19,7 @@ along with PyF.  If not, see <http://www.gnu.org/licenses/>.
 
 from pyf.props import Property, SwitchEvent
 from pyf.errors import *
+from pyf import handler
 import containers
 import  string
 
@@ -26,6 +27,10 @@ class Normal(Property):
 	'''Display descriptions for objects.'''
 	EVT_EXAMINED = 'evtExamined'
 	
+	sentences = (
+		(('examine', '*self'), 'examine'),
+	)
+	
 	def __init__(self, long=None, short=None, inv=None, descIn={}):
 		Property.__init__(self)
 		self.long = long
@@ -43,10 +48,6 @@ class Normal(Property):
 		if not self.inv:
 			self.inv = self.owner.indefinite
 		
-	def handle(self, sentence, output):
-		if sentence == ('examine', '*self'):
-			self.examine(output)
-		
 	def examine(self, output):
 		output.write(self.getLong(), obj=self.owner)
 		
@@ -145,6 +146,10 @@ class Mobile(Property):
 	'''Shown when the object is already where player is trying to push it.'''
 	NOT_MOVABLE = 'notMovable'
 	'''Shown when player tries to move an object that's not movable.'''
+	TAKEN_SEVERAL = 'takenSeveral'
+	'''Printed when player takes several objects at once, eg. "take all".'''
+	DROPPED_SEVERAL = 'droppedSeveral'
+	'''Printed when player drops several objects at once, eg. "drop all".'''
 	
 	responses = {
 		TAKEN : 'Taken.',
@@ -156,8 +161,15 @@ class Mobile(Property):
 		NOT_DROPPABLE : "That's not something you want to leave lying around.",
 		PUSHED : "You push [self.definite] [nouns[1].name].",
 		ALREADY_PUSHED : "[self.definite] is already pushed [nouns[0].name].",
+		TAKEN_SEVERAL : "Taken: %s.",
+		DROPPED_SEVERAL : "Dropped: %s.",
 	}
 	
+	sentences = (
+		(('take', '*self'), 'take'),
+		(('drop', '*self'), 'drop'),
+	)
+	
 	def __init__(self, droppable=True, takeable=True, movable=True, autoDescribe=True):
 		Property.__init__(self)
 		self.droppable=droppable
@@ -171,11 +183,7 @@ class Mobile(Property):
 		self.autoDescribe = autoDescribe
 		
 	def handle(self, sentence, output):
-		if sentence == ('take', '*self'):
-			self.take(output)
-		elif sentence == ('drop', '*self'):
-			self.drop(output)
-		elif sentence[:2] == ("push", '*self') and sentence[2] in ('*location', '*direction'):
+		if sentence[:2] == ("push", '*self') and sentence[2] in ('*location', '*direction'):
 			self.push(sentence[2].item, output)
 			
 	def push(self, location, output):
@@ -223,8 +231,8 @@ class Mobile(Property):
 				
 	def doDrop(self):
 		self.dispatchEvent(Mobile.EVT_DROPPED)	
-		self.dropped = True
 		self.owner.move(self.owner.game.actor.owner)
+		self.dropped = True
 		
 def _openableHandle(self, event):
 	if self.closed:
@@ -279,6 +287,13 @@ class Openable(Property):
 		CURRENTLY_OPEN : "It's open."
 	}
 	
+	sentences = (
+		(('open', '*self'), 'open'),
+		(('close', '*self'), 'close'),
+	)
+	
+	worldAttributes = ('closed', 'locked')
+	
 	def __init__(self, closed=True, locked=False, key=None):
 		Property.__init__(self)
 		self.closed = closed
@@ -291,11 +306,7 @@ class Openable(Property):
 		self.owner.addEventListener(self.owner.EVT_OWNED_ITEM_HANDLE, (self, _openableHandle))
 		
 	def handle(self, sentence, output):
-		if sentence == ('open', '*self'):
-			self.open(output)
-		elif sentence == ('close', '*self'):
-			self.close(output)
-		elif self.key != None:
+		if self.key != None:
 			if sentence == ('unlock', '*self'):
 				self.unlock(output)
 			elif sentence == ('lock', '*self'):
@@ -423,6 +434,8 @@ class Dark(Property):
 		HANDLE_DARK : "There's not enough light.",
 	}
 	
+	worldAttributes = ('light',)
+	
 	def __init__(self, light=False):
 		Property.__init__(self)
 		self.light = light
@@ -444,23 +457,60 @@ class Dark(Property):
 		
 	@property
 	def lit(self):
-		for item in self.ownerGame.inventory:
-
-			if LightSource in item.props:
-				if item.LightSource.on:
-					if self.owner.canAccess(item):
-						if not item.LightSource.inverse:
-							return True
-						else:
-							return False
-		
-		return self.light
+		'''True if a light source reaches the item, or it's lit by itself. Looked up
+		from Game.lighting.'''
+		return self.ownerGame.lighting.isLit(self)
 		
 class LightSource(Property):
 	'''When item is in a dark room, light it.'''
+	worldAttributes = ('on', 'inverse')
+	
 	def __init__(self, on=True, inverse=False):
 		Property.__init__(self)
 		self.on = on
 		'''Whether it's currently emitting light.'''
 		self.inverse = inverse
-		'''True if item should suck light from container rather than emit it.'''
\ No newline at end of file
+		'''True if item should suck light from container rather than emit it.'''
+
+class Lighting(object):
+	'''Light in a game world. Keeps the items with a LightSource switched on and
+	whether each Dark item is lit, worked out once after every change to the world
+	(see handler.worldChanged) instead of on every check.'''
+	
+	def __init__(self, game):
+		'''game : Game'''
+		self.game = game
+		self.version = None
+		'''handler.worldVersion the cached state was worked out for.'''
+		self.sources = []
+		'''Items with a LightSource switched on, in the order they were added.'''
+		self.lit = {}
+		'''Dark.lit by the id of the Dark property.'''
+	
+	def update(self):
+		'''Forget the cached state if the world has changed since it was worked out.'''
+		if self.version != handler.worldVersion:
+			self.version = handler.worldVersion
+			self.sources = [item for item in self.game.registry.withProp(LightSource)
+				if LightSource in item.props and item.LightSource.on]
+			self.lit = {}
+	
+	def isLit(self, dark):
+		'''Return True if the owner of dark can reach a light source, or if dark is
+		lit by itself. The first light source reached decides, and an inverse one
+		darkens instead.
+		
+		dark : Dark'''
+		self.update()
+		try:
+			return self.lit[id(dark)]
+		except KeyError:
+			pass
+		
+		lit = dark.light
+		for item in self.sources:
+			if dark.owner.canAccess(item):
+				lit = not item.LightSource.inverse
+				break
+		self.lit[id(dark)] = lit
+		return lit
\ No newline at end of file
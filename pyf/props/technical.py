@@ -52,6 +52,14 @@ class Appliance(Property):
 		'turnOff' : 'You turn off [self.definite].', 
 		'alreadyTurnedOff' : "It's already turned off."
 	}
+	
+	sentences = (
+		(('turn', '*self', 'on'), 'turnOn'),
+		(('turn on', '*self'), 'turnOn'),
+		(('turn', '*self', 'off'), 'turnOff'),
+		(('turn off', '*self'), 'turnOff'),
+	)
+	
 	def __init__(self, on=False):
 		Property.__init__(self)
 		self.on = on
@@ -63,13 +71,6 @@ class Appliance(Property):
 			else:
 				return self.responses['turnedOff']
 				
-	def handle(self, sentence, output):
-		s = sentence
-		if s == ('turn', '*self', 'on') or s == ('turn on', '*self',):
-			self.turnOn(output)
-		elif s == ('turn', '*self', 'off') or s == ('turn off', '*self',):
-			self.turnOff(output)
-				
 	def turnOn(self, output):
 		if not self.on:
 			self.doTurnOn()
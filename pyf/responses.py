@@ -19,11 +19,14 @@ along with PyF.  If not, see <http://www.gnu.org/licenses/>.
 import handler
 
 class Responses:
-	'''Container class for handler responses.'''
+	'''Container class for handler responses. The dict is shared with the class
+	of the handler until a response is set, see __setitem__.'''
 	
 	def __init__(self, parent, dict):
 		self.parent = parent
 		self.dict = dict
+		self.shared = True
+		'''Whether self.dict is still the dict of the class.'''
 		
 	@property
 	def ownerGame(self):
@@ -41,5 +44,10 @@ class Responses:
 		return self.dict[name]
 			
 	def __setitem__(self, name, value):
+		'''Set response in the dict of this instance. The shared dict is copied on
+		the first write only, so the dict of the class stays untouched.'''
 		handler.log(self, 'dict')
+		if self.shared:
+			self.dict = self.dict.copy()
+			self.shared = False
 		self.dict[name] = value
\ No newline at end of file
@@ -119,6 +119,10 @@ words = (
 	Preposition('beside'),
 	Preposition('from', 'out of'),
 
+	Multiple('all', 'everything'),
+	Conjunction('and'),
+	Exclusion('except', 'but'),
+	
 	Internal('again', 'g'),
 	Internal('undo'),
 	Internal('save'),
@@ -56,21 +56,18 @@ class Running(State):
 			sentence.words = self.lastSentence.words
 		self.lastSentence = sentence
 		
+		actor = self.actor
 		try:
-			actor = self.actor
-			actor.intHandle(sentence, output)
-			for word in sentence.nouns:
-				item = word.item
-				if actor.canAccess(item):
-					item.intHandle(sentence, output)
-						
-			actor.owner.intHandle(sentence, output)
-			actor.ownerGame.intHandle(sentence, output)
+			objects = actor.objects(sentence)
+			if objects != None:
+				actor.handleObjects(sentence, objects, output)
+			self.handleWords(sentence, output)
 			handled = False
 		except OutputClosed:
 			handled = True
 			
 		timed = self.handleTimedEvents(sentence, output)
+		actor.handled = handled or timed
 		if not handled and not timed:
 			try:
 				actor.unhandledSentence(sentence, output)
@@ -78,6 +75,19 @@ class Running(State):
 			except OutputClosed:
 				pass
 	
+	def handleWords(self, sentence, output):
+		'''Take sentence through the actor, the items it refers to, the location
+		of the actor and the game. OutputClosed is raised once it's handled.'''
+		actor = self.actor
+		actor.intHandle(sentence, output)
+		for word in sentence.nouns:
+			item = word.item
+			if actor.canAccess(item):
+				item.intHandle(sentence, output)
+		
+		actor.owner.intHandle(sentence, output)
+		actor.ownerGame.intHandle(sentence, output)
+	
 	def handleTimedEvents(self, sentence, output):
 		l = self.timedEvents
 		self.timedEvents = []
@@ -95,59 +105,98 @@ class Running(State):
 		return handled
 		
 class Disambiguation(State):
+	'''Resolves the ambiguous words of a sentence one span at a time. Matching is
+	resumed where the AmbiguityError stopped it, keeping the words applied before.'''
 	def __init__(self, actor, error):
 		State.__init__(self, actor)
-		self.words = error.words
 		self.sentence = error.sentence
+		self.chosen = []
+		'''Matches picked without asking the player, to be announced.'''
+		self.done = False
+		'''True once the whole sentence has been matched.'''
+		self.setError(error)
+	
+	def setError(self, error):
+		self.words = error.words
 		self.matches = error.matches
 		
 	def handle(self, sentence, output):
-		found = None
-		for match in self.words:
-			word = match.wordObject
-			if word == sentence.s:
-				found = match
-				
-		if found:
-			self.resumeMatching(match)
-			output.write('(%s)' % word.definite, False)
-			self.oldState.handle(self.sentence, output)
-		else:
-			self.oldState.handle(sentence, output)
-			
+		'''Answers are taken by Actor.input through choose, so anything handled here
+		is a new command.'''
 		self.restoreState()
+		self.actor.state.handle(sentence, output)
 		
-	def tryResolve(self):
+	def prune(self):
+		'''Narrow the candidates down in one pass. A noun the actor refers to with
+		a pronoun wins, otherwise only nouns the actor can access are kept.
+		
+		returns : list of Match'''
+		pronouns = set([id(word) for word in self.actor.pronouns.values()])
 		l = []
 		for match in self.words:
-			if type(match.wordObject) == lib.Noun:
-				if match.wordObject in self.sentence.actor.pronouns.values():
-					if self.sentence.actor.canAccess(match.wordObject.item):
-						l = [match]
-						break
-				elif self.actor.canAccess(match.wordObject.item):
-					l.append(match)
+			word = match.wordObject
+			if not isinstance(word, lib.Noun):
+				raise DisambiguationError("Can't resolve %s - only nouns can be ambiguous." % str(word))
+			if self.actor.canAccess(word.item):
+				if id(word) in pronouns:
+					return [match]
+				l.append(match)
+		return l
+	
+	def tryResolve(self):
+		'''Resolve ambiguous spans without asking the player as long as possible.
+		If none of the candidates can be accessed, the first one is used and left
+		for the handlers to reject.
+		
+		returns : bool - True if the whole sentence has been matched.'''
+		while True:
+			l = self.prune()
+			if len(l) > 1:
+				self.words = l
+				return False
+			elif l:
+				self.chosen.append(l[0])
+				match = l[0]
 			else:
-				raise DisambiguationError("Can't resolve %s - only nouns can be ambiguous." % str(match.wordObject))
+				match = self.words[0]
+			
+			if self.resume(match):
+				return True
 				
-		self.words = l
-		return self.resolved()
+	def choose(self, sentence):
+		'''Resume matching with the candidate the player's answer describes, eg.
+		"brass" for "Which do you mean, the brass key or the iron key?".
 		
-	def resolved(self):
-		if len(self.words) == 1:
-			return True
-		elif len(self.words) == 0:
-			raise DisambiguationError("None of the matches are possible")
-		else:
+		returns : bool - False if the answer doesn't describe exactly one
+			candidate, and should be handled as a new command.'''
+		found = []
+		for match in self.words:
+			if match.wordObject.describedBy(sentence.tokens):
+				found.append(match)
+		if len(found) != 1:
+			return False
+		
+		self.chosen = []
+		if not self.resume(found[0]):
+			self.tryResolve()
+		return True
+	
+	def resume(self, match):
+		'''Continue matching the sentence with match chosen for the ambiguous span.
+		
+		returns : bool - False if another span is ambiguous.'''
+		try:
+			self.sentence.resumeMatching(match)
+		except AmbiguityError, e:
+			self.setError(e)
 			return False
+		
+		self.done = True
+		self.restoreState()
+		return True
 			
 	def specifyObject(self, output):
 		pass
-			
-	def resumeMatching(self, match):
-		self.matches.insert(0, match)
-		self.sentence.applyMatches(self.matches)
-		self.restoreState()
 	
 	def message(self):
 		s = 'Which do you mean, '
@@ -0,0 +1,53 @@
+'''Tests for handling a line of several commands.'''
+
+"""This file is part of PyF.
+
+PyF is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyF is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyF.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import unittest
+
+from pyf import game, items, props
+
+class CommandsTest(unittest.TestCase):
+	
+	def setUp(self):
+		self.game = game.Game()
+		room = items.Room()
+		room.name = 'room',
+		self.player = items.Actor()
+		self.hat = items.Item()
+		self.hat.name = 'hat',
+		self.hat.addProp(props.Normal(long='A hat.'))
+		self.hat.addProp(props.Mobile())
+		self.hat.addProp(props.Wearable(worn=True))
+		self.hat.finalizeProps()
+		self.game.addItems(room, self.player, self.hat)
+		self.game.actor = self.player
+		self.player.move(room)
+		self.hat.move(self.player)
+	
+	def testUnknownWordHandled(self):
+		'''"off" is an Unknown word matched by a Wearable pattern.'''
+		lines = self.game.input('take hat off. drop hat').lines
+		self.assertEqual(lines[-1], 'Dropped.')
+		self.assertFalse(self.hat.owner is self.player)
+		
+	def testUnhandledSkipsRest(self):
+		lines = self.game.input('xyzzy. drop hat').lines
+		self.assertEqual(lines[-1], '(skipped "drop hat")')
+		self.assertTrue(self.hat.owner is self.player)
+
+if __name__ == '__main__':
+	unittest.main()
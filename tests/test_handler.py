@@ -0,0 +1,64 @@
+'''Tests for sentence dispatch in handlers.'''
+
+"""This file is part of PyF.
+
+PyF is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyF is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyF.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import unittest
+
+from pyf import game, items, props
+
+class Stuck(props.Openable):
+	'''Openable that refuses to open in handle.'''
+	def handle(self, sentence, output):
+		if sentence == ('open', '*self'):
+			output.write("It's stuck.")
+
+class Sealed(props.Openable):
+	'''Openable with its sentence patterns switched off.'''
+	sentences = ()
+
+class OverrideTest(unittest.TestCase):
+	'''Subclasses overriding the patterns of Openable.'''
+	
+	def play(self, prop):
+		g = game.Game()
+		room = items.Room()
+		room.name = 'room',
+		player = items.Actor()
+		box = items.Item()
+		box.name = 'box',
+		box.addProp(props.Normal(long='A box.'))
+		box.addProp(prop)
+		box.finalizeProps()
+		g.addItems(room, player, box)
+		g.actor = player
+		player.move(room)
+		box.move(room)
+		return g.input('open box').lines[-1], prop.closed
+		
+	def testHandleOverrides(self):
+		self.assertEqual(self.play(Stuck()), ("It's stuck.", True))
+		
+	def testNoSentences(self):
+		line, closed = self.play(Sealed())
+		self.assertTrue(closed)
+		
+	def testDefault(self):
+		line, closed = self.play(props.Openable())
+		self.assertFalse(closed)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,163 @@
+'''Tests for moving items around in the game world.'''
+
+"""This file is part of PyF.
+
+PyF is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyF is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyF.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import unittest
+
+from pyf import game, items, props
+
+class Player(items.Actor):
+	pass
+
+def item(cls, name):
+	'''Create an instance of cls called name.'''
+	o = cls()
+	o.name = name,
+	return o
+
+class Statue(items.Item):
+	'''Item that refuses to be taken in handle.'''
+	def handle(self, sentence, output):
+		if sentence == ('take', '*self'):
+			output.write("The statue is bolted to the floor.")
+
+class Prize(props.Mobile):
+	'''Mobile awarding points in an overridden doTake.'''
+	def doTake(self):
+		props.Mobile.doTake(self)
+		self.ownerGame.addScore(5, 'taking ' + self.owner.name)
+
+Prize.name = 'Mobile'
+
+def cloakMoved(self, event):
+	if event.destination is not self.ownerGame.actor:
+		event.output.write("This isn't the best place to leave a smart cloak lying around.")
+
+class DropAllTest(unittest.TestCase):
+	'''A move stopped by a listener in the middle of "drop all".'''
+	
+	def setUp(self):
+		self.game = game.Game()
+		self.room = item(items.Room, 'foyer')
+		self.player = Player()
+		self.game.addItems(self.room, self.player)
+		self.game.actor = self.player
+		self.player.move(self.room)
+		
+		self.coin = item(items.Item, 'coin')
+		self.cloak = item(items.Item, 'cloak')
+		self.gem = item(items.Item, 'gem')
+		for o in (self.coin, self.cloak, self.gem):
+			o.addProp(props.Normal(long='A thing.'))
+			o.addProp(props.Mobile())
+			o.finalizeProps()
+			self.game.addItem(o)
+			o.move(self.player)
+		self.cloak.addEventListener(self.cloak.EVT_MOVED, (self.cloak, cloakMoved))
+		
+	def testVetoedItemStays(self):
+		output = self.game.input('drop all')
+		
+		for o in (self.coin, self.gem):
+			self.assertTrue(o.owner is self.room)
+			self.assertTrue(o.location is self.room)
+			self.assertTrue(o in self.room.inventory)
+			self.assertFalse(o in self.player.inventory)
+			self.assertTrue(o.Mobile.dropped)
+		
+		self.assertTrue(self.cloak.owner is self.player)
+		self.assertTrue(self.cloak.location is self.player)
+		self.assertTrue(self.cloak in self.player.inventory)
+		self.assertFalse(self.cloak in self.room.inventory)
+		self.assertFalse(self.cloak.Mobile.dropped)
+		
+		self.assertEqual(output.lines, [
+			"Cloak: This isn't the best place to leave a smart cloak lying around.",
+			"Dropped: the coin and the gem.",
+		])
+	
+	def testUndo(self):
+		self.game.input('drop all')
+		self.game.input('undo')
+		
+		for o in (self.coin, self.cloak, self.gem):
+			self.assertTrue(o.owner is self.player)
+			self.assertTrue(o.location is self.player)
+		self.assertEqual(self.player.inventory.list, [self.coin, self.cloak, self.gem])
+		self.assertEqual(self.room.inventory.list, [self.player])
+
+class TakeSeveralTest(unittest.TestCase):
+	'''Each item of "take all" and of lists goes through the handling of a
+	sentence naming it alone.'''
+	
+	def setUp(self):
+		self.game = game.Game()
+		self.room = item(items.Room, 'foyer')
+		self.player = Player()
+		self.game.addItems(self.room, self.player)
+		self.game.actor = self.player
+		self.player.move(self.room)
+		
+		self.coin = self.add(items.Item, 'coin', props.Mobile())
+		self.gem = self.add(items.Item, 'gem', props.Mobile())
+	
+	def add(self, cls, name, mobile):
+		o = item(cls, name)
+		o.addProp(props.Normal(long='A thing.'))
+		o.addProp(mobile)
+		o.finalizeProps()
+		self.game.addItem(o)
+		o.move(self.room)
+		return o
+	
+	def testDark(self):
+		self.room.addProp(props.Normal(long='A room.'))
+		self.room.addProp(props.Dark())
+		self.room.finalizeProps()
+		
+		self.assertEqual(self.game.input('take coin').lines[-1], "There's not enough light.")
+		output = self.game.input('take coin and gem')
+		
+		for o in (self.coin, self.gem):
+			self.assertTrue(o.owner is self.room)
+		self.assertEqual(output.lines[-2:], [
+			"Coin: There's not enough light.",
+			"Gem: There's not enough light.",
+		])
+	
+	def testHandleRefuses(self):
+		statue = self.add(Statue, 'statue', props.Mobile())
+		output = self.game.input('take all')
+		
+		self.assertTrue(statue.owner is self.room)
+		self.assertTrue(self.coin.owner is self.player)
+		self.assertTrue(self.gem.owner is self.player)
+		self.assertEqual(output.lines[-2:], [
+			'Statue: The statue is bolted to the floor.',
+			'Taken: the coin and the gem.',
+		])
+	
+	def testDoTakeOverride(self):
+		trophy = self.add(items.Item, 'trophy', Prize())
+		output = self.game.input('take all')
+		
+		self.assertTrue(trophy.owner is self.player)
+		self.assertEqual(self.game.scoreList, {'taking trophy' : 5})
+		self.assertEqual(output.lines[-1], 'Taken: the coin, the gem and the trophy.')
+
+if __name__ == '__main__':
+	unittest.main()
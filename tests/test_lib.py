@@ -0,0 +1,91 @@
+'''Tests for correcting and completing words.'''
+
+"""This file is part of PyF.
+
+PyF is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyF is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyF.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+import unittest
+
+from pyf import game, items, lib, props
+
+class CorrectTest(unittest.TestCase):
+	'''Misspelled nouns with Lib.correct on.'''
+	
+	def setUp(self):
+		self.game = game.Game()
+		self.room = items.Room()
+		self.room.name = 'room',
+		self.cellar = items.Room()
+		self.cellar.name = 'cellar',
+		self.player = items.Actor()
+		self.lamp = items.Item()
+		self.lamp.name = 'lantern',
+		self.lamp.addProp(props.Normal(long='A brass lamp.'))
+		self.lamp.finalizeProps()
+		self.game.addItems(self.room, self.cellar, self.player, self.lamp)
+		self.game.actor = self.player
+		self.player.move(self.room)
+		self.lamp.move(self.room)
+	
+	def tearDown(self):
+		self.game.lib.__dict__.pop('correct', None)
+		self.game.lib.cache.clear()
+	
+	def testSwitchedOn(self):
+		'''A parse cached with correct off isn't reused once it's on.'''
+		self.game.input('x lantrn')
+		self.game.lib.correct = True
+		lines = self.game.input('x lantrn').lines
+		self.assertTrue('(assuming "lantrn" means "lantern")' in lines)
+		self.assertEqual(lines[-1], 'A brass lamp.')
+	
+	def testOutOfReach(self):
+		self.lamp.move(self.cellar)
+		self.game.lib.correct = True
+		lines = self.game.input('x lantrn').lines
+		self.assertFalse([line for line in lines if 'lantern' in line])
+		
+		self.lamp.move(self.room)
+		lines = self.game.input('x lantrn').lines
+		self.assertEqual(lines[-1], 'A brass lamp.')
+
+class CompleteTest(unittest.TestCase):
+	'''Completing the adjectives of nouns.'''
+	
+	def setUp(self):
+		self.game = game.Game()
+		room = items.Room()
+		room.name = 'room',
+		player = items.Actor()
+		key = items.Item()
+		key.name = 'key',
+		key.adjective = lib.Adjective('brass', 'small')
+		key.addProp(props.Normal(long='A small brass key.'))
+		key.finalizeProps()
+		self.game.addItems(room, player, key)
+		self.game.actor = player
+		player.move(room)
+		key.move(room)
+	
+	def testAdjective(self):
+		self.assertEqual(self.game.complete('x bra'), ['x brass'])
+	
+	def testAfterAdjective(self):
+		self.assertEqual(self.game.complete('x brass k'), ['x brass key'])
+		self.assertEqual(self.game.complete('x small '), ['x small key', 'x small brass'])
+
+if __name__ == '__main__':
+	unittest.main()